@@ -0,0 +1,10 @@
+'''
+Benchmarks of fmakefile on synthetic Fortran projects.
+
+Usage:
+    python -m benchmarks --preset medium
+    python -m benchmarks --files 50000 --depth 20 --baseline benchmarks/baseline.json
+'''
+
+from .generate import generate_project
+from .harness import PHASES, run_benchmark, compare_results
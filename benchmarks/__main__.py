@@ -0,0 +1,150 @@
+import sys
+import json
+import optparse
+import tempfile
+from pathlib import Path
+
+from .generate import DEFAULTS, generate_project
+from .harness import PHASES, run_benchmark, compare_results
+
+# ()()()()()()()()()()()()()()()()()() DEFINE ARGUMENTS ()()()()()()()()()()()()()()()()()() #
+
+PRESETS = {
+           'small':  {'files': 1000,   'depth': 8},
+           'medium': {'files': 10000,  'depth': 16},
+           'large':  {'files': 100000, 'depth': 32, 'files_per_directory': 1000},
+          }
+
+BASELINE = Path(__file__).parent / 'baseline.json'
+
+parser = optparse.OptionParser()
+
+parser.add_option('--preset',
+                  dest='preset',
+                  action='store',
+                  type='choice',
+                  choices=tuple(PRESETS),
+                  help='use predefined project size (%s)' % ', '.join(PRESETS))
+
+for key, value in DEFAULTS.items():
+    parser.add_option('--' + key.replace('_', '-'),
+                      dest=key,
+                      action='store',
+                      type='float' if isinstance(value, float) else 'int',
+                      help=f'generated project parameter (default {value})')
+
+parser.add_option('--project-dir',
+                  dest='project_dir',
+                  action='store',
+                  help='directory for the generated project (temporary directory by default)')
+
+parser.add_option('-j', '--jobs',
+                  dest='jobs',
+                  action='store',
+                  type='int',
+                  default=1,
+                  help='number of processes for parsing source files (0 - use all cores)')
+
+parser.add_option('--repeat',
+                  dest='repeat',
+                  action='store',
+                  type='int',
+                  default=3,
+                  help='number of runs, the best time of every phase is taken')
+
+parser.add_option('--trace-memory',
+                  dest='trace_memory',
+                  action='store_true',
+                  default=False,
+                  help='measure peak memory of every phase (extra slow run)')
+
+parser.add_option('--baseline',
+                  dest='baseline',
+                  action='store',
+                  default=str(BASELINE),
+                  help='file with stored results to compare with')
+
+parser.add_option('--save-baseline',
+                  dest='save_baseline',
+                  action='store_true',
+                  default=False,
+                  help='store results into the baseline file')
+
+parser.add_option('--tolerance',
+                  dest='tolerance',
+                  action='store',
+                  type='float',
+                  default=0.2,
+                  help='allowed relative slowdown before reporting regression')
+
+parser.add_option('--json',
+                  dest='json',
+                  action='store_true',
+                  default=False,
+                  help='print results as json')
+
+# ()()()()()()()()()()()()()()()()()() PARSE ARGUMENTS ()()()()()()()()()()()()()()()()()() #
+
+(options, args) = parser.parse_args()
+
+label = options.preset or 'custom'
+parameters = dict(PRESETS.get(options.preset, {}))
+parameters.update({key: getattr(options, key) for key in DEFAULTS
+                   if getattr(options, key) is not None})
+if options.preset and len(parameters) > len(PRESETS[options.preset]):
+    label = 'custom'
+
+project_dir = options.project_dir or Path(tempfile.gettempdir()) / f'fmakefile-benchmark-{label}'
+
+# ()()()()()()()()()()()()()()()()()() RUN ()()()()()()()()()()()()()()()()()() #
+
+print(f'Generating project at {project_dir}...', file=sys.stderr)
+Path(project_dir).mkdir(parents=True, exist_ok=True)
+parameters = generate_project(project_dir, **parameters)
+
+print(f'Running benchmark ({options.repeat} run(s))...', file=sys.stderr)
+result = run_benchmark(project_dir, jobs=options.jobs, repeat=options.repeat,
+                       trace_memory=options.trace_memory)
+result['parameters'] = parameters
+
+try:
+    with open(options.baseline, encoding='utf-8') as stream:
+        baselines = json.load(stream)
+except (OSError, ValueError):
+    baselines = {}
+
+baseline = baselines.get(label)
+if baseline and (baseline['parameters'] != parameters or baseline['jobs'] != options.jobs):
+    print(f'Baseline "{label}" was measured with other parameters, not compared.',
+          file=sys.stderr)
+    baseline = None
+
+rows = compare_results(result, baseline, options.tolerance) if baseline else []
+
+if options.json:
+    print(json.dumps({'label': label, 'result': result,
+                      'regressions': [row[0] for row in rows if row[-1]]}, indent=2))
+else:
+    print(f'\n{label}: {result["files"]} files, jobs={options.jobs}\n')
+    for name in PHASES + ('total',):
+        value = result['total'] if name == 'total' else result['timings'][name]
+        memory = result['memory'].get(name)
+        print('  %-8s %9.3f s' % (name, value) +
+              (' %10.1f MiB' % (memory/2**20) if memory is not None else ''))
+    if result['peak_rss'] is not None:
+        print('  %-8s %9.1f MiB' % ('peak rss', result['peak_rss']/2**20))
+
+    if rows:
+        print(f'\ncompared with baseline ({options.baseline}):\n')
+        for metric, old, new, ratio, regression in rows:
+            print('  %-15s %12.4g -> %12.4g  x%.2f%s' % (metric, old, new, ratio,
+                                                        '  REGRESSION' if regression else ''))
+
+if options.save_baseline:
+    baselines[label] = result
+    with open(options.baseline, 'w', encoding='utf-8') as stream:
+        json.dump(baselines, stream, indent=1, sort_keys=True)
+    print(f'\nbaseline "{label}" saved to {options.baseline}', file=sys.stderr)
+
+if any(row[-1] for row in rows):
+    sys.exit(1)
@@ -0,0 +1,170 @@
+import json
+import random
+import shutil
+from pathlib import Path
+
+####################################################################################################
+
+# generation parameters with default values
+DEFAULTS = {
+            'files':               1000,
+            'modules_per_file':    1,
+            'fanout':              3,
+            'depth':               8,
+            'include_ratio':       0.1,
+            'fixed_ratio':         0.1,
+            'non_utf8_ratio':      0.05,
+            'files_per_directory': 500,
+            'lines_per_file':      40,
+            'seed':                0,
+           }
+
+# the file with generation parameters (project is not generated again if they are the same)
+MARKER = '.benchmark.json'
+
+INCLUDE_NAME = 'common.inc'
+
+####################################################################################################
+
+def source_path(k, fixed, files_per_directory):
+    '''
+    Get path of the <k>-th source file (relative to the project directory).
+    '''
+    extension = '.f' if fixed else '.f90'
+    return Path('src') / f'd{k//files_per_directory:04d}' / f'f{k:06d}{extension}'
+
+####################################################################################################
+
+def source_text(k, uses, modules, include, fixed, non_utf8, lines):
+    '''
+    Get contents of the synthetic source file.
+
+    Arguments:
+        k        - file number
+        uses     - modules used by the file
+        modules  - modules defined in the file
+        include  - include common file
+        fixed    - fixed form
+        non_utf8 - put comment in cp1251 encoding
+        lines    - number of statements in every subroutine
+
+    Returns:
+        bytes
+    '''
+    indent, comment = ('      ', 'C     ') if fixed else ('', '! ')
+
+    text = [f'{comment}synthetic source file {k}']
+    if non_utf8:
+        text.append(f'{comment}Комментарий в кодировке cp1251')
+
+    for module in modules:
+        text.append(f'{indent}module {module}')
+        text += [f'{indent}use {name}' for name in uses]
+        text.append(f'{indent}implicit none')
+        if include:
+            text.append(f"{indent}include '{INCLUDE_NAME}'")
+        text.append(f'{indent}contains')
+
+        text.append(f'{indent}subroutine s_{module}(x)')
+        text.append(f'{indent}real x')
+        text += [f'{indent}x = x + {n}.0' for n in range(lines)]
+        text.append(f'{indent}end subroutine s_{module}')
+
+        text.append(f'{indent}real function f_{module}(x)')
+        text.append(f'{indent}real x')
+        text.append(f'{indent}f_{module} = 2.0*x')
+        text.append(f'{indent}end function f_{module}')
+
+        text.append(f'{indent}end module {module}')
+
+    return ('\n'.join(text) + '\n').encode('cp1251' if non_utf8 else 'utf-8')
+
+####################################################################################################
+
+def generate_project(directory, **kwargs):
+    '''
+    Generate synthetic Fortran project at <directory>. Files are spread over <depth> levels
+    of the module dependency graph, every file uses <fanout> modules of the lower levels
+    (at least one of the previous level, so the graph depth is exact). The program file
+    uses modules of the top level.
+
+    Arguments:
+        directory           - project directory
+        files               - number of source files (besides the program one)
+        modules_per_file    - number of modules in every file
+        fanout              - number of files whose modules are used by every file
+        depth               - depth of the dependency graph
+        include_ratio       - fraction of files including common file
+        fixed_ratio         - fraction of fixed form files
+        non_utf8_ratio      - fraction of files with cp1251 encoded comments
+        files_per_directory - number of files in every subdirectory
+        lines_per_file      - number of statements in every subroutine
+        seed                - random seed
+
+    Returns:
+        generation parameters
+    '''
+    check_arguments = set(kwargs) - set(DEFAULTS)
+    if check_arguments:
+        raise KeyError(f'Unexpected argument(s): {list(check_arguments)}')
+
+    parameters = dict(DEFAULTS, **kwargs)
+    directory = Path(directory)
+
+    # the same project is already there
+    try:
+        with open(directory / MARKER, encoding='utf-8') as stream:
+            if json.load(stream) == parameters:
+                return parameters
+    except (OSError, ValueError):
+        pass
+
+    if (directory / 'src').exists():
+        shutil.rmtree(directory / 'src')
+
+    files, depth = parameters['files'], max(1, min(parameters['depth'], parameters['files']))
+    rng = random.Random(parameters['seed'])
+
+    fixed = [rng.random() < parameters['fixed_ratio'] for _ in range(files)]
+    levels = [k*depth//files for k in range(files)]
+
+    # first file of every level
+    starts = [levels.index(level) for level in range(depth)]
+
+    def modules(k):
+        return [f'm{k}_{j}' for j in range(parameters['modules_per_file'])]
+
+    for k in range(files):
+        level = levels[k]
+
+        used = set()
+        if level:
+            used.add(rng.randrange(starts[level-1], starts[level]))
+            while len(used) < min(parameters['fanout'], starts[level]):
+                used.add(rng.randrange(0, starts[level]))
+
+        path = directory / source_path(k, fixed[k], parameters['files_per_directory'])
+        if not path.parent.exists():
+            path.parent.mkdir(parents=True)
+            with open(path.parent / INCLUDE_NAME, 'w', encoding='utf-8') as stream:
+                stream.write('      integer, parameter :: nsize = 100\n')
+
+        text = source_text(k,
+                           uses=[rng.choice(modules(dep)) for dep in sorted(used)],
+                           modules=modules(k),
+                           include=rng.random() < parameters['include_ratio'],
+                           fixed=fixed[k],
+                           non_utf8=rng.random() < parameters['non_utf8_ratio'],
+                           lines=parameters['lines_per_file'])
+        path.write_bytes(text)
+
+    top = [k for k in range(files) if levels[k] == depth-1][:parameters['fanout']]
+    program = ['program main']
+    program += [f'use {modules(k)[0]}' for k in top]
+    program += ['implicit none', 'end program main']
+    (directory / 'src' / 'main.f90').write_text('\n'.join(program) + '\n', encoding='utf-8')
+
+    with open(directory / MARKER, 'w', encoding='utf-8') as stream:
+        json.dump(parameters, stream, indent=1)
+
+    return parameters
@@ -0,0 +1,145 @@
+import os
+import gc
+import sys
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from fmakefile.makefile import ProjectParser, collect_files, write_if_changed
+
+####################################################################################################
+
+PHASES = ('collect', 'parse', 'resolve', 'emit')
+
+####################################################################################################
+
+def peak_rss():
+    '''
+    Get peak resident set size of the process in bytes (None if not available).
+    '''
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak*1024
+
+####################################################################################################
+
+def run_phases(jobs=1, trace_memory=False):
+    '''
+    Run phases of the makefile generation for the project in the current directory.
+
+    Arguments:
+        jobs         - number of parsing processes
+        trace_memory - measure peak of python allocations of every phase (slow)
+
+    Returns:
+        (timings, memory peaks) dictionaries, phase -> seconds (bytes)
+    '''
+    fparser = ProjectParser(verbose=False, drop_execute_flag=False, cache=None, jobs=jobs)
+    fparser.directory = '.'
+
+    timings, memory, result = {}, {}, {}
+
+    def phase(name, function):
+        gc.collect()
+        if trace_memory:
+            tracemalloc.start()
+        start = time.perf_counter()
+        result[name] = function()
+        timings[name] = time.perf_counter() - start
+        if trace_memory:
+            memory[name] = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+    def collect():
+        fparser.fileset = collect_files(fparser.directory, fparser.ignore_paths,
+                                        fparser.extensions)
+
+    def emit():
+        if os.path.exists(fparser.makefile_name):
+            os.remove(fparser.makefile_name)
+        write_if_changed(fparser.makefile_name, fparser.render_makefile(*result['resolve']))
+
+    phase('collect', collect)
+    phase('parse', fparser.parse_project)
+    phase('resolve', fparser.resolve_dependencies)
+    phase('emit', emit)
+
+    return timings, memory
+
+####################################################################################################
+
+def run_benchmark(directory, jobs=1, repeat=3, trace_memory=False):
+    '''
+    Measure phases of the makefile generation for the project at <directory>.
+
+    Arguments:
+        directory    - project directory
+        jobs         - number of parsing processes
+        repeat       - number of runs (the best time of every phase is taken)
+        trace_memory - measure peak of python allocations of every phase (slow, separate run)
+
+    Returns:
+        dictionary with timings (seconds), memory peaks (bytes) and number of files
+    '''
+    current = os.getcwd()
+    os.chdir(directory)
+    try:
+        timings = {}
+        for _ in range(repeat):
+            run, _ = run_phases(jobs)
+            for name in PHASES:
+                timings[name] = min(timings.get(name, run[name]), run[name])
+
+        memory = run_phases(jobs, trace_memory=True)[1] if trace_memory else {}
+        files = len(collect_files('.', [], ProjectParser.DEFAULTS['extensions']))
+    finally:
+        os.chdir(current)
+
+    return {'files':       files,
+            'jobs':        jobs,
+            'timings':     timings,
+            'total':       sum(timings.values()),
+            'memory':      memory,
+            'peak_rss':    peak_rss()}
+
+####################################################################################################
+
+def compare_results(result, baseline, tolerance=0.2, noise=0.05):
+    '''
+    Compare benchmark <result> with the <baseline> one.
+
+    Arguments:
+        result    - current result (see run_benchmark)
+        baseline  - stored result
+        tolerance - allowed relative slowdown (or memory growth)
+        noise     - absolute difference in seconds which is never reported as regression
+
+    Returns:
+        list of (metric, baseline value, current value, ratio, is regression)
+    '''
+    rows = []
+
+    def add(metric, old, new, threshold):
+        if old is None or new is None:
+            return
+        ratio = new/old if old else float('inf')
+        regression = ratio > 1 + tolerance and new - old > threshold
+        rows.append((metric, old, new, ratio, regression))
+
+    for name in PHASES + ('total',):
+        old = baseline['timings'].get(name) if name != 'total' else baseline.get('total')
+        new = result['timings'].get(name) if name != 'total' else result.get('total')
+        add(name, old, new, noise)
+
+    for name in PHASES:
+        add(f'{name} memory', baseline.get('memory', {}).get(name),
+            result['memory'].get(name), 0)
+
+    add('peak rss', baseline.get('peak_rss'), result.get('peak_rss'), 0)
+
+    return rows
@@ -1,15 +1,11 @@
-
-import sys
 import logging
 
-from .makefile import ProjectParser
+from .makefile import ProjectParser, FortranSyntaxError, generate
 
 __version__ = '0.2.0a'
 __author__ = 'Anton Zakharov'
 
 
+# logging is configured by the application (see __main__), not by the library
 logger = logging.getLogger(__name__)
-logging.basicConfig(level=logging.INFO,
-                    format='%(asctime)-15s %(levelname)8s: %(name)s(%(lineno)4s): %(message)s',
-                    datefmt="%Y-%m-%d %H:%M:%S",
-                    handlers=[logging.StreamHandler(sys.stdout)])
+logger.addHandler(logging.NullHandler())
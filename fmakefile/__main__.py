@@ -2,24 +2,14 @@
 
 import os
 import sys
-
-# tricky way to beat the case when package is not installed and script is called via symlink
-# we need to add package path to the os.path variable first, then module is available for import
-# first we need to check if we follow symlink
-
-current = os.path.abspath(__file__)
-if os.path.islink(current):
-    path = os.path.dirname(os.readlink(current))
-else:
-    path = os.path.dirname(current)
-
-if path not in sys.path:
-    sys.path.insert(0, path)
-
+import logging
+import json
 import optparse
-import platform
 
-from .makefile import ProjectParser
+from .makefile import ProjectParser, FortranSyntaxError, platform_
+from .watch import watch_project
+from .build import Builder
+from .trace import TraceRecorder
 
 # ()()()()()()()()()()()()()()()()()() DEFINE ARGUMENTS ()()()()()()()()()()()()()()()()()() #
 
@@ -67,15 +57,72 @@ parser.add_option('--dependence',
                   action='store',
                   help='specify dependence (object files, modules)')
 
+parser.add_option('--generator',
+                  dest='generator',
+                  action='store',
+                  help='specify output generator (make, ninja)')
+
 parser.add_option('--makefile-name',
                   dest='makefile_name',
                   action='store',
                   help='specify name for makefile')
 
+parser.add_option('--fragments-dir',
+                  dest='fragments_directory',
+                  action='store',
+                  help='write rules of every object into .d fragment in the directory, '
+                       'makefile includes them (make generator)')
+
+parser.add_option('--update-fragments',
+                  dest='update_fragments',
+                  action='store_true',
+                  default=False,
+                  help='quietly update makefile and fragments (used by generated makefile)')
+
+parser.add_option('--module-dir',
+                  dest='module_directory',
+                  action='store',
+                  help='specify directory for .mod files')
+
+parser.add_option('--grouped-targets',
+                  dest='grouped_targets',
+                  action='store',
+                  type='choice',
+                  choices=('auto', 'yes', 'no'),
+                  help='declare .mod files as grouped targets, GNU make 4.3+ (auto, yes, no)')
+
+parser.add_option('--module-stamps',
+                  dest='module_stamps',
+                  action='store_true',
+                  default=False,
+                  help='rebuild users of a module only when its interface changes (modules mode)')
+
+parser.add_option('--reachability',
+                  dest='reachability',
+                  action='store',
+                  type='choice',
+                  choices=('list', 'prune'),
+                  help='collect call sites and list objects not reachable from the program(s) '
+                       'or do not build them (list, prune)')
+
+parser.add_option('--fixed-line-length',
+                  dest='fixed_line_length',
+                  action='store',
+                  type='int',
+                  help='ignore fixed form text after the column (72 by default, e.g. 132 for '
+                       '-ffixed-line-length-132 or -extend-source)')
+
 parser.add_option('--ignore-paths',
                   dest='ignore_paths',
                   action='store',
-                  help='ignore path (separate with ;)')
+                  help='ignore path or glob pattern, e.g. build;*/tests;**/old_* (separate with ;)')
+
+parser.add_option('--collector',
+                  dest='collector',
+                  action='store',
+                  type='choice',
+                  choices=('walk', 'git'),
+                  help='how to find source files: walk directory or take them from git (walk, git)')
 
 parser.add_option('--ignore-modules',
                   dest='ignore_modules',
@@ -91,7 +138,21 @@ parser.add_option('--config',
                   dest='configuration',
                   action='store',
                   default='release',
-                  help='select required configuration (debug, release)')
+                  help='select required configuration (debug, release), several ones can be '
+                       'built side by side with --build-dir (separate with ;)')
+
+parser.add_option('--add-config',
+                  dest='add_configurations',
+                  action='append',
+                  default=[],
+                  help='add configuration with custom primary parameters for --build-dir, '
+                       'e.g. "profile=-O2 -pg" (can be repeated)')
+
+parser.add_option('--build-dir',
+                  dest='build_directory',
+                  action='store',
+                  help='place objects, .mod files and executables of every configuration '
+                       'into its subdirectory of the build directory')
 
 parser.add_option('--pparams',
                   dest='pcompiler_params',
@@ -103,11 +164,100 @@ parser.add_option('--sparams',
                   action='store',
                   help='specify secondary compiler parameters')
 
+parser.add_option('--cache',
+                  dest='cache',
+                  action='store',
+                  default=ProjectParser.CACHE_FILE,
+                  help='specify parse cache file name (%default by default)')
+
+parser.add_option('--no-cache',
+                  dest='no_cache',
+                  action='store_true',
+                  default=False,
+                  help='do not use parse cache')
+
+parser.add_option('--no-preprocess',
+                  dest='no_preprocess',
+                  action='store_true',
+                  default=False,
+                  help='ignore preprocessor directives (#if, #ifdef, #include) while scanning')
+
+parser.add_option('--compile-cache',
+                  dest='compile_cache',
+                  action='store',
+                  help='specify directory of the compilation cache (objects and .mod files)')
+
+parser.add_option('--compile-cache-size',
+                  dest='compile_cache_size',
+                  action='store',
+                  help='specify size limit of the compilation cache (e.g. 500M, 5G)')
+
+parser.add_option('-j', '--jobs',
+                  dest='jobs',
+                  action='store',
+                  type='int',
+                  help='number of processes for parsing source files, see --build-jobs for '
+                       'compiling (0 - use all cores)')
+
+parser.add_option('--timestamp',
+                  dest='timestamp',
+                  action='store_true',
+                  default=False,
+                  help='put generation time into makefile header')
+
+parser.add_option('--watch',
+                  dest='watch',
+                  action='store_true',
+                  default=False,
+                  help='keep makefile up to date while source files are changed')
+
+parser.add_option('--poll',
+                  dest='poll',
+                  action='store_true',
+                  default=False,
+                  help='use polling instead of inotify in watch mode')
+
+parser.add_option('--graph-report',
+                  dest='graph_report',
+                  action='store',
+                  help='report dependency graph statistics (text, json or name of json file)')
+
+parser.add_option('--impacted-by',
+                  dest='impacted_by',
+                  action='store',
+                  help='print json with objects, modules and programs to be rebuilt if the files '
+                       'are changed, makefile is not written (separate with ;)')
+
+parser.add_option('--profile',
+                  dest='profile',
+                  action='store',
+                  help='write Chrome trace (Perfetto) json file and print the slowest files')
+
+parser.add_option('--build',
+                  dest='build',
+                  action='store_true',
+                  default=False,
+                  help='build the project with built-in parallel executor (no make required)')
+
+parser.add_option('--build-check',
+                  dest='build_check',
+                  action='store',
+                  type='choice',
+                  choices=Builder.CHECKS,
+                  default='timestamp',
+                  help='how to detect up-to-date objects for --build (timestamp, hash)')
+
+parser.add_option('--build-jobs',
+                  dest='build_jobs',
+                  action='store',
+                  type='int',
+                  help='number of compiler processes for --build (default - use all cores)')
+
 parser.add_option('--make',
                   dest='make',
                   action='store_true',
                   default=False,
-                  help='call make')
+                  help='call make (or ninja for ninja generator)')
 
 # ()()()()()()()()()()()()()()()()()() PARSE ARGUMENTS ()()()()()()()()()()()()()()()()()() #
 
@@ -142,24 +292,54 @@ if options.ignore_includes:
 if options.extensions:
     options.extensions = options.extensions.split(';')
 
+if options.grouped_targets:
+    options.grouped_targets = {'auto': None, 'yes': True, 'no': False}[options.grouped_targets]
+
 if options.dependency:
     allowed = ('object files', 'modules')
     if options.dependency not in allowed:
         raise ValueError('Unexpected value for --dependence option. Expected %s' % (allowed))
 
+if options.generator:
+    allowed = ('make', 'ninja')
+    if options.generator not in allowed:
+        raise ValueError('Unexpected value for --generator option. Expected %s' % (allowed))
+
 if options.configuration and any([options.pcompiler_params, options.scompiler_params]):
     raise ValueError('--config option is incompatible with --pparams and --sparams.')
 
+configurations = {}
 if options.configuration:
     allowed = ('debug', 'release')
-    if options.configuration not in allowed:
-        raise ValueError('Unexpected value for --config option. Expected %s' % (allowed))
+    for name in options.configuration.split(';'):
+        if name not in allowed:
+            raise ValueError('Unexpected value for --config option. Expected %s' % (allowed))
 
-    if options.configuration == 'debug':
         pparams = ProjectParser.DEFAULTS['pcompiler_params']
-        options.pcompiler_params = pparams.replace('/O3', '/O1').replace('-O3', '-O1')
+        if name == 'debug':
+            pparams = pparams.replace('/O3', '/O1').replace('-O3', '-O1')
+        configurations[name] = {'pcompiler_params': pparams}
+
+    if len(configurations) > 1 and not options.build_directory:
+        raise ValueError('Several configurations require --build-dir option.')
+
+    if 'debug' in configurations and not options.build_directory:
+        options.pcompiler_params = configurations['debug']['pcompiler_params']
 
-skip, external = ('make', 'configuration', None), {}
+for item in options.add_configurations:
+    name, separator, pparams = item.partition('=')
+    if not separator:
+        raise ValueError('Unexpected value for --add-config option. Expected name=parameters')
+    configurations[name] = {'pcompiler_params': pparams}
+
+if options.add_configurations and not options.build_directory:
+    raise ValueError('--add-config option requires --build-dir option.')
+
+skip = ('make', 'configuration', 'add_configurations', 'no_cache', 'no_preprocess', 'jobs',
+        'watch', 'poll', 'grouped_targets', 'graph_report', 'build', 'build_check', 'profile',
+        'build_jobs', 'update_fragments', 'impacted_by', None)
+
+external = {}
 for option in parser.option_list:
     key = option.dest
     if key not in skip:
@@ -167,13 +347,78 @@ for option in parser.option_list:
         if value:
             external[key] = value
 
+# compiler parameters may be empty
+for key in ('pcompiler_params', 'scompiler_params'):
+    if getattr(options, key) == '':
+        external[key] = ''
+
+if options.no_cache:
+    external['cache'] = None
+
+if options.update_fragments:
+    external['verbose'] = False
+
+if options.no_preprocess:
+    external['preprocess'] = False
+
+if options.jobs is not None:
+    external['jobs'] = options.jobs
+
+if options.grouped_targets is not None:
+    external['grouped_targets'] = options.grouped_targets
+
+if options.build_directory and configurations:
+    external['configurations'] = configurations
+
 # ()()()()()()()()()()()()()()()()()() RUN ()()()()()()()()()()()()()()()()()() #
 
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)-15s %(levelname)8s: %(name)s(%(lineno)4s): %(message)s',
+                    datefmt="%Y-%m-%d %H:%M:%S",
+                    handlers=[logging.StreamHandler(sys.stdout)])
+
 fparser = ProjectParser(**external)
+
+if options.profile:
+    recorder = TraceRecorder()
+    fparser.add_hook(recorder)
+
+if options.impacted_by:
+    try:
+        fparser.analize_project('.')
+        impact = fparser.impacted_by([path for path in options.impacted_by.split(';') if path])
+    except (FortranSyntaxError, OSError) as error:
+        sys.exit(f'fmakefile: error: {error}')
+    print(json.dumps(impact, indent=2))
+    sys.exit()
+
+if options.watch:
+    watch_project(fparser, '.', poll=options.poll)
+    sys.exit()
+
 fparser.create_makefile('.')
 
-if options.make:
-    if platform.system() == 'Windows':
+if options.profile:
+    recorder.save(options.profile)
+    recorder.print_summary()
+
+if options.graph_report:
+    if options.graph_report == 'text':
+        fparser.print_graph_report()
+    elif options.graph_report == 'json':
+        print(json.dumps(fparser.graph_report(), indent=2))
+    else:
+        with open(options.graph_report, 'w') as stream:
+            json.dump(fparser.graph_report(), stream, indent=2)
+
+if options.build:
+    if not Builder(fparser, jobs=options.build_jobs, check=options.build_check).run():
+        sys.exit(1)
+
+elif options.make:
+    if fparser.generator == 'ninja':
+        os.system('ninja -f ' + fparser.makefile_name)
+    elif platform_ == 'Windows':
         os.system('nmake -f ' + fparser.makefile_name)
-    elif platform.system() == 'Linux':
+    elif platform_ == 'Linux':
         os.system('make -f ' + fparser.makefile_name)
@@ -0,0 +1,356 @@
+import os
+import json
+import shlex
+import hashlib
+import logging
+import subprocess
+import collections
+import concurrent.futures
+from pathlib import Path
+
+from .makefile import platform_, module_filename, write_if_changed
+from .ccache import CompilationCache
+
+####################################################################################################
+
+logger = logging.getLogger(__name__)
+
+####################################################################################################
+
+def split_flags(flags):
+    '''
+    Split compiler parameters string into the list of arguments.
+    '''
+    return shlex.split(flags or '', posix=platform_ != 'Windows')
+
+####################################################################################################
+
+def digest_files(files, digest=None):
+    '''
+    Update <digest> with contents of the <files> (missing files are skipped).
+    '''
+    digest = digest or hashlib.sha1()
+    for file in files:
+        try:
+            with open(file, 'rb') as stream:
+                digest.update(stream.read())
+        except OSError:
+            digest.update(b'\0missing\0')
+    return digest
+
+####################################################################################################
+
+class Builder:
+    '''
+    Build the parsed project without make. Compiler processes are launched from a bounded
+    pool: a file is compiled as soon as all providers of the modules it uses are compiled.
+    '''
+    CHECKS = ('timestamp', 'hash')
+
+    def __init__(self, fparser, jobs=None, check='timestamp', state_file='.fmakefile.build',
+                 configuration=None):
+        '''
+        Arguments:
+            fparser       - project parser (create_makefile or parse_project is to be called)
+            jobs          - maximum number of compiler processes (all cores if None or 0)
+            check         - how up-to-date objects are detected: timestamp (like make) or hash
+                            (contents of the source, included files and used .mod files)
+            state_file    - file to keep compiler commands and signatures of built objects
+            configuration - configuration to build if parser has build directory (the first
+                            one if None)
+        '''
+        if check not in Builder.CHECKS:
+            raise ValueError(f'Unexpected check {check}. Expected one of {Builder.CHECKS}')
+
+        self.fparser, self.check, self.state_file = fparser, check, state_file
+        self.jobs = jobs or os.cpu_count() or 1
+
+        # objects and modules are placed into the configuration directory
+        self.configuration, self.directory = None, None
+        self.pcompiler_params, self.scompiler_params = (fparser.pcompiler_params,
+                                                        fparser.scompiler_params)
+        if fparser.build_directory is not None:
+            self.configuration = configuration or next(iter(fparser.configurations))
+            if self.configuration not in fparser.configurations:
+                raise ValueError(f'Unknown configuration {self.configuration}. '
+                                 f'Expected one of {list(fparser.configurations)}')
+            self.directory = fparser.configuration_directory(self.configuration)
+            self.pcompiler_params, self.scompiler_params = fparser.configuration_params(
+                self.configuration)
+        self.module_directory = fparser.module_path(self.directory)
+
+        try:
+            with open(state_file, encoding='utf-8') as stream:
+                self.state = json.load(stream)
+        except (OSError, ValueError):
+            self.state = {}
+
+        self.cache = None
+        if fparser.compile_cache:
+            self.cache = CompilationCache(fparser.compile_cache, fparser.compile_cache_size)
+
+        self.diagnostics = {}
+
+    def object_file(self, file):
+        '''
+        Get object file name for the source <file>.
+        '''
+        return self.fparser.object_file(file, self.directory)
+
+    def module_files(self, file):
+        '''
+        Get .mod (and .smod) files produced by compilation of the <file>.
+        '''
+        directory = Path(self.module_directory or '.')
+        modules = self.fparser.provided_modules(file)
+        return [str(directory / module_filename(module)) for module in modules]
+
+    def providers(self, file):
+        '''
+        Get files providing modules used by the <file>.
+        '''
+        fparser = self.fparser
+        return list(dict.fromkeys(fparser.modules[dep]
+                                  for dep in fparser.used_modules(file)))
+
+    def compile_command(self, file):
+        '''
+        Get compiler call for the <file> (the same as makefile recipe).
+        '''
+        fparser = self.fparser
+        command = [fparser.compiler, '-c']
+        command += split_flags(self.pcompiler_params) + split_flags(self.scompiler_params)
+        if self.module_directory:
+            command += split_flags(fparser.module_flag() + self.module_directory)
+        return command + [file, '-o', self.object_file(file)]
+
+    def link_command(self, inputs, target):
+        '''
+        Get linker call for the executable <target> (the same as makefile recipe).
+        '''
+        return ([self.fparser.compiler] + inputs + split_flags(self.scompiler_params) +
+                ['-o', target])
+
+    def link_steps(self, objects):
+        '''
+        Get list of (target, input files, command) to make executables from the compiled
+        <objects>: the application or the library and programs of the multi-program project.
+        '''
+        fparser = self.fparser
+        executables = fparser.executables()
+
+        if len(executables) == 1:
+            appname = fparser.build_path(fparser.appname, self.directory)
+            inputs = [self.object_file(file) for file in objects]
+            return [(appname, inputs, self.link_command(inputs, appname))]
+
+        library = self.library()
+        inputs = [self.object_file(file) for file in fparser.library_objects(objects)]
+        steps = [(library, inputs, split_flags(fparser.archiver() + library) + inputs)]
+
+        for name, program in executables.items():
+            name = fparser.build_path(name, self.directory)
+            inputs = [self.object_file(program), library]
+            steps.append((name, inputs, self.link_command(inputs, name)))
+
+        return steps
+
+    def library(self):
+        '''
+        Get path of the library of the multi-program project.
+        '''
+        return self.fparser.build_path(self.fparser.library_name(), self.directory)
+
+    def signature(self, file, command):
+        '''
+        Get hash of everything the object of <file> depends on: compiler call, contents of the
+        source, included and used .mod files (signatures of providers if .mod is not found).
+        '''
+        digest = hashlib.sha1(command.encode())
+        digest_files([file] + self.fparser.structure[file]['includes'], digest)
+        for provider in self.providers(file):
+            modules = self.module_files(provider)
+            if modules and all(os.path.isfile(module) for module in modules):
+                digest_files(modules, digest)
+            else:
+                digest.update(self.state.get(self.object_file(provider), {}).get('signature', '')
+                                         .encode())
+        return digest.hexdigest()
+
+    def is_up_to_date(self, file, command, rebuilt):
+        '''
+        Check whether object of the <file> needs no compilation.
+
+        Arguments:
+            file    - source file
+            command - compiler call
+            rebuilt - set of files compiled during this build
+        '''
+        obj = self.object_file(file)
+        state = self.state.get(obj, {})
+
+        if not os.path.isfile(obj) or state.get('command') != command:
+            return False
+
+        if not all(os.path.isfile(module) for module in self.module_files(file)):
+            return False
+
+        if self.check == 'hash':
+            return state.get('signature') == self.signature(file, command)
+
+        if rebuilt.intersection(self.providers(file)):
+            return False
+
+        mtime = os.stat(obj).st_mtime_ns
+        inputs = [file] + self.fparser.structure[file]['includes']
+        inputs += [self.object_file(provider) for provider in self.providers(file)]
+        return all(os.stat(path).st_mtime_ns <= mtime for path in inputs if os.path.exists(path))
+
+    def compile(self, file, command):
+        '''
+        Call compiler (or linker) and capture its output. Objects are restored from the
+        compilation cache if possible.
+
+        Returns:
+            (exit code, output)
+        '''
+        if self.cache and file in self.fparser.structure:
+            directory = Path(self.module_directory or '.')
+            inputs = [file] + self.fparser.structure[file]['includes']
+            inputs += [str(directory / module_filename(dep))
+                       for dep in self.fparser.used_modules(file)]
+            outputs = [self.object_file(file)] + self.module_files(file)
+            return self.cache.compile(command, inputs, outputs)
+
+        result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                universal_newlines=True)
+        return result.returncode, result.stdout
+
+    def run(self):
+        '''
+        Compile the project and link the application (or programs, see link_steps).
+
+        Returns:
+            True if application is up to date, diagnostics of compiler calls are kept in
+            <diagnostics> dictionary (file -> output)
+        '''
+        fparser = self.fparser
+        objects, _ = fparser.resolve_dependencies()
+
+        directories = [self.module_directory] + [os.path.dirname(self.object_file(file))
+                                                 for file in objects]
+        for directory in dict.fromkeys(directories):
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+
+        waiting = {file: len(self.providers(file)) for file in objects}
+        ready = collections.deque(file for file in objects if not waiting[file])
+        rebuilt, failed = set(), []
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.jobs) as executor:
+            running = {}
+            while ready or running:
+
+                # stop launching new processes after the first failure
+                while ready and not failed and len(running) < self.jobs:
+                    file = ready.popleft()
+                    command = self.compile_command(file)
+
+                    if self.is_up_to_date(file, ' '.join(command), rebuilt):
+                        ready.extend(self.release(file, waiting))
+                        continue
+
+                    if fparser.verbose:
+                        print(' '.join(command))
+                    running[executor.submit(self.compile, file, command)] = file, command
+
+                if not running:
+                    if failed:
+                        break
+                    continue
+
+                finished, _ = concurrent.futures.wait(running, return_when='FIRST_COMPLETED')
+                for future in finished:
+                    file, command = running.pop(future)
+                    code, output = future.result()
+
+                    self.diagnostics[file] = output
+                    if output:
+                        print(output, end='' if output.endswith('\n') else '\n')
+
+                    if code:
+                        failed.append(file)
+                        self.state.pop(self.object_file(file), None)
+                        continue
+
+                    rebuilt.add(file)
+                    command = ' '.join(command)
+                    state = {'command': command}
+                    if self.check == 'hash':
+                        state['signature'] = self.signature(file, command)
+                    self.state[self.object_file(file)] = state
+                    ready.extend(self.release(file, waiting))
+
+        self.save()
+
+        if self.cache and fparser.verbose:
+            print(f'compile cache: {self.cache.hits} hit(s), {self.cache.misses} miss(es)')
+
+        if failed:
+            print(f'\nBuild failed: {", ".join(failed)}')
+            return False
+
+        updated = set(self.object_file(file) for file in rebuilt)
+        for target, inputs, command in self.link_steps(objects):
+
+            if updated.isdisjoint(inputs) and self.is_linked(target, inputs, ' '.join(command)):
+                if fparser.verbose:
+                    print(f'{target} is up to date.')
+                continue
+
+            # archiver updates members of the existing library
+            if target == self.library() and os.path.isfile(target):
+                os.remove(target)
+
+            if fparser.verbose:
+                print(' '.join(command))
+            code, output = self.compile(target, command)
+            self.diagnostics[target] = output
+            if output:
+                print(output, end='' if output.endswith('\n') else '\n')
+            if code:
+                print(f'\nBuild failed: {target}')
+                return False
+
+            updated.add(target)
+            self.state[target] = {'command': ' '.join(command)}
+            self.save()
+
+        return True
+
+    def is_linked(self, target, inputs, command):
+        '''
+        Check whether <target> is newer than all <inputs> and made with the same command.
+        '''
+        if not os.path.isfile(target) or self.state.get(target, {}).get('command') != command:
+            return False
+
+        mtime = os.stat(target).st_mtime_ns
+        return all(os.stat(path).st_mtime_ns <= mtime for path in inputs)
+
+    def release(self, file, waiting):
+        '''
+        Mark <file> as compiled and get its users which became ready.
+        '''
+        ready = []
+        for user in self.fparser.dependents[file]:
+            waiting[user] -= 1
+            if not waiting[user]:
+                ready.append(user)
+        return ready
+
+    def save(self):
+        '''
+        Store commands and signatures of built objects.
+        '''
+        write_if_changed(self.state_file, json.dumps(self.state, indent=1, sort_keys=True))
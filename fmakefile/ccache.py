@@ -0,0 +1,378 @@
+import os
+import sys
+import json
+import uuid
+import shutil
+import hashlib
+import optparse
+import contextlib
+import subprocess
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+####################################################################################################
+
+# bump to invalidate all the cached entries (e.g. when key composition changes)
+KEY_VERSION = b'fmakefile-ccache-1'
+
+SIZE_SUFFIXES = {'K': 1 << 10, 'M': 1 << 20, 'G': 1 << 30, 'T': 1 << 40}
+
+# file of the cache directory keeping hits, misses and total size of the entries
+STATS_FILE = 'stats.json'
+
+####################################################################################################
+
+def parse_size(size):
+    '''
+    Convert size like 500M or 5G into number of bytes.
+    '''
+    if isinstance(size, int):
+        return size
+
+    size = size.strip().upper().rstrip('B')
+    if size and size[-1] in SIZE_SUFFIXES:
+        return int(float(size[:-1]) * SIZE_SUFFIXES[size[-1]])
+    return int(size)
+
+####################################################################################################
+
+def compile_key(command, inputs):
+    '''
+    Get key of the compilation: hash of the compiler call (compiler and flags), compiler
+    executable identity and contents of the <inputs> (source, included and used .mod files).
+
+    Arguments:
+        command - compiler call [list of strings]
+        inputs  - files the compilation result depends on
+    '''
+    digest = hashlib.sha1(KEY_VERSION)
+
+    for argument in command:
+        digest.update(argument.encode() + b'\0')
+
+    compiler = shutil.which(command[0])
+    if compiler:
+        stat = os.stat(compiler)
+        digest.update(f'{stat.st_size}:{stat.st_mtime_ns}'.encode())
+
+    for path in inputs:
+        digest.update(str(path).encode() + b'\0')
+        try:
+            with open(path, 'rb') as stream:
+                digest.update(hashlib.sha1(stream.read()).digest())
+        except OSError:
+            digest.update(b'\0missing\0')
+
+    return digest.hexdigest()
+
+####################################################################################################
+
+@contextlib.contextmanager
+def locked(path):
+    '''
+    Hold exclusive lock of the file <path> (created if missing) within the block.
+    '''
+    handle = os.open(path, os.O_RDWR | os.O_CREAT)
+    try:
+        if fcntl:
+            fcntl.flock(handle, fcntl.LOCK_EX)
+        else:
+            msvcrt.locking(handle, msvcrt.LK_LOCK, 1)
+        yield
+    finally:
+        os.close(handle)  # releases the lock
+
+####################################################################################################
+
+class CompilationCache:
+    '''
+    Content-addressed storage of compilation results (object and .mod files).
+
+    Every entry is a directory named by the compilation key, holding copies of the outputs
+    and a manifest. Entries are evicted in least-recently-used order when the size limit
+    is exceeded. Hits, misses and the total size are counted in the small statistics file,
+    updated under a lock, so concurrent compiler calls (make -j) do not lose the counts.
+    '''
+
+    def __init__(self, directory, max_size='5G'):
+        '''
+        Arguments:
+            directory - cache directory
+            max_size  - size limit (bytes or string like 500M, 5G)
+        '''
+        self.directory, self.max_size = str(directory), parse_size(max_size)
+        os.makedirs(self.directory, exist_ok=True)
+
+        # statistics of this instance (overall ones are kept in the cache directory)
+        self.hits, self.misses = 0, 0
+
+    def entry(self, key):
+        return os.path.join(self.directory, key[:2], key)
+
+    def count(self, event):
+        '''
+        Register <event> (hits, misses) for statistics.
+        '''
+        setattr(self, event, getattr(self, event) + 1)
+        self.update_counters(**{event: 1})
+
+    def read_counters(self):
+        '''
+        Get dictionary of the counters: hits, misses and size (None if size is not tracked yet).
+        '''
+        counters = {'hits': 0, 'misses': 0, 'size': None}
+        try:
+            with open(os.path.join(self.directory, STATS_FILE), encoding='utf-8') as stream:
+                counters.update(json.load(stream))
+        except (OSError, ValueError):
+            pass
+        return counters
+
+    def update_counters(self, reset=(), **increments):
+        '''
+        Add <increments> (hits, misses, size) to the counters, counters listed in <reset> are
+        set to the given values instead. File is replaced atomically while the lock is held,
+        so concurrent updates are not lost and readers never see it partially written.
+
+        Returns:
+            updated counters
+        '''
+        path = os.path.join(self.directory, STATS_FILE)
+        with locked(path + '.lock'):
+            counters = self.read_counters()
+            for key, value in increments.items():
+                if key in reset:
+                    counters[key] = value
+                elif counters[key] is not None:  # size is not tracked until the first eviction
+                    counters[key] = max(0, counters[key] + value)
+
+            temporary = f'{path}.{uuid.uuid4().hex}.tmp'
+            with open(temporary, 'w', encoding='utf-8') as stream:
+                json.dump(counters, stream)
+            os.replace(temporary, path)
+
+        return counters
+
+    def restore(self, key, outputs):
+        '''
+        Copy cached outputs of the compilation with <key> into place.
+
+        Returns:
+            True on cache hit
+        '''
+        entry = self.entry(key)
+        try:
+            with open(os.path.join(entry, 'manifest.json'), encoding='utf-8') as stream:
+                manifest = json.load(stream)
+        except (OSError, ValueError):
+            self.count('misses')
+            return False
+
+        if len(manifest) != len(outputs):
+            self.count('misses')
+            return False
+
+        # entry may be evicted concurrently, then the compiler is called
+        for name, output in zip(manifest, outputs):
+            temporary = f'{output}.{uuid.uuid4().hex}.tmp'
+            try:
+                shutil.copyfile(os.path.join(entry, name), temporary)
+                os.replace(temporary, output)
+            except OSError:
+                try:
+                    os.remove(temporary)
+                except OSError:
+                    pass
+                self.count('misses')
+                return False
+
+        # modification time of the manifest is the last use time (for eviction)
+        try:
+            os.utime(os.path.join(entry, 'manifest.json'))
+        except OSError:
+            pass
+        self.count('hits')
+        return True
+
+    def store(self, key, outputs):
+        '''
+        Save <outputs> of the compilation with <key>. Outputs are silently skipped if any
+        of them is missing.
+        '''
+        if not all(os.path.isfile(output) for output in outputs):
+            return
+
+        entry = self.entry(key)
+        if os.path.isdir(entry):
+            return
+
+        temporary = f'{entry}.{uuid.uuid4().hex}.tmp'
+        os.makedirs(temporary)
+
+        manifest = [f'{k}_{os.path.basename(output)}' for k, output in enumerate(outputs)]
+        for name, output in zip(manifest, outputs):
+            shutil.copyfile(output, os.path.join(temporary, name))
+        with open(os.path.join(temporary, 'manifest.json'), 'w', encoding='utf-8') as stream:
+            json.dump(manifest, stream)
+        size = sum(item.stat().st_size for item in os.scandir(temporary))
+
+        try:
+            os.rename(temporary, entry)
+        except OSError:  # stored concurrently by another process
+            shutil.rmtree(temporary, ignore_errors=True)
+            return
+
+        # the whole cache is scanned only when the limit is exceeded (or size is not tracked)
+        tracked = self.update_counters(size=size)['size']
+        if tracked is None or tracked > self.max_size:
+            self.evict()
+
+    def entries(self):
+        '''
+        Get list of (last use time, size, path) of all entries.
+        '''
+        entries = []
+        for bucket in os.scandir(self.directory):
+            if not bucket.is_dir():
+                continue
+            for entry in os.scandir(bucket.path):
+                if entry.name.endswith('.tmp'):
+                    continue
+                try:
+                    size = sum(item.stat().st_size for item in os.scandir(entry.path))
+                    used = os.stat(os.path.join(entry.path, 'manifest.json')).st_mtime_ns
+                except OSError:
+                    continue
+                entries.append((used, size, entry.path))
+        return entries
+
+    def evict(self):
+        '''
+        Remove least recently used entries while the cache exceeds the size limit. Tracked
+        size is decreased by the removed entries, so entries stored meanwhile are kept
+        counted (it is set to the actual size if it is not tracked yet).
+        '''
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total - removed <= self.max_size:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            removed += size
+
+        if self.read_counters()['size'] is None:
+            self.update_counters(size=total-removed, reset=('size',))
+        elif removed:
+            self.update_counters(size=-removed)
+
+    def statistics(self):
+        '''
+        Get cache statistics: hits, misses, hit rate, number of entries and total size.
+        '''
+        counters, entries = self.read_counters(), self.entries()
+        hits, misses = counters['hits'], counters['misses']
+        return {'hits':     hits,
+                'misses':   misses,
+                'hit_rate': hits/(hits+misses) if hits+misses else 0.0,
+                'entries':  len(entries),
+                'size':     sum(size for _, size, _ in entries),
+                'max_size': self.max_size}
+
+    def zero_statistics(self):
+        self.update_counters(hits=0, misses=0, reset=('hits', 'misses'))
+
+    def compile(self, command, inputs, outputs):
+        '''
+        Run compiler <command> unless its <outputs> are found in the cache.
+
+        Arguments:
+            command - compiler call
+            inputs  - files the result depends on (see compile_key)
+            outputs - produced files (object and .mod files)
+
+        Returns:
+            (exit code, output of the compiler)
+        '''
+        key = compile_key(command, inputs)
+        if self.restore(key, outputs):
+            return 0, ''
+
+        result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                universal_newlines=True)
+        if not result.returncode:
+            self.store(key, outputs)
+
+        return result.returncode, result.stdout
+
+####################################################################################################
+
+def main(argv=None):
+    '''
+    Compiler wrapper used in generated makefiles:
+        python -m fmakefile.ccache --dir DIR --output OBJ --input SRC -- COMPILER ARGS...
+    '''
+    parser = optparse.OptionParser(usage='%prog [options] -- compiler arguments')
+
+    parser.add_option('--dir',
+                      dest='directory',
+                      action='store',
+                      default='.fmakefile.ccache',
+                      help='specify cache directory')
+
+    parser.add_option('--max-size',
+                      dest='max_size',
+                      action='store',
+                      default='5G',
+                      help='specify cache size limit (e.g. 500M, 5G)')
+
+    parser.add_option('--input',
+                      dest='inputs',
+                      action='append',
+                      default=[],
+                      help='file the compilation depends on (source, included, used .mod)')
+
+    parser.add_option('--output',
+                      dest='outputs',
+                      action='append',
+                      default=[],
+                      help='file produced by the compilation (object, .mod)')
+
+    parser.add_option('--stats',
+                      dest='stats',
+                      action='store_true',
+                      default=False,
+                      help='show cache statistics')
+
+    parser.add_option('--zero-stats',
+                      dest='zero_stats',
+                      action='store_true',
+                      default=False,
+                      help='reset cache statistics')
+
+    (options, command) = parser.parse_args(argv)
+
+    cache = CompilationCache(options.directory, options.max_size)
+
+    if options.stats or options.zero_stats:
+        if options.zero_stats:
+            cache.zero_statistics()
+        for key, value in cache.statistics().items():
+            print('%-9s %s' % (key+':', f'{value:.1%}' if key == 'hit_rate' else value))
+        return 0
+
+    if not command:
+        parser.error('compiler call is not specified')
+
+    code, output = cache.compile(command, options.inputs, options.outputs)
+    sys.stdout.write(output)
+    return code
+
+####################################################################################################
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -2,21 +2,26 @@
 import os
 import sys
 import re
-import platform
-import subprocess
+import io
+import copy
+import json
+import hashlib
+import functools
+import collections
+import concurrent.futures
 import logging
-import datetime
+import time
+import contextlib
 from pathlib import Path
 
-import treelib
-
 ####################################################################################################
 
 logger = logging.getLogger(__name__)
 
 ####################################################################################################
 
-platform_ = platform.system()
+# the same as platform.system(), which is not imported to keep the import fast
+platform_ = 'Windows' if sys.platform == 'win32' else os.uname().sysname
 
 PRESETS = {
            'ifort': {
@@ -28,7 +33,9 @@ PRESETS = {
                                                 'iflogm', 'ifcom', 'ifauto', 'omp_lib',
                                                 'dfport','dflib', 'dfwin', 'dflogm', 'dfauto'
                                                ],
-                                 'stdincludes': ['omp_lib.h']
+                                 'stdincludes': ['omp_lib.h'],
+                                 'modflag':     '/module:',
+                                 'archiver':    'lib /nologo /out:'
                                 },
                      'Linux': {
                                'pparams':     '-O3 -fpp -diag-disable 7000,7734,7954,8290,8291',
@@ -38,7 +45,9 @@ PRESETS = {
                                                'iflogm', 'ifcom', 'ifauto', 'omp_lib',
                                                'dfport','dflib', 'dfwin', 'dflogm', 'dfauto'
                                               ],
-                               'stdincludes': ['omp_lib.h']
+                               'stdincludes': ['omp_lib.h'],
+                               'modflag':     '-module ',
+                               'archiver':    'ar rcs '
                               }
                     },
 
@@ -47,13 +56,17 @@ PRESETS = {
                                     'pparams':     '-O3 -fsyntax-only',
                                     'sparams':     '-fopenmp',
                                     'stdmodules':  [],
-                                    'stdincludes': []
+                                    'stdincludes': [],
+                                    'modflag':     '-J',
+                                    'archiver':    'ar rcs '
                                    },
                         'Linux': {
                                  'pparams':     '-O3 -fsyntax-only',
                                  'sparams':     '-fopenmp',
                                  'stdmodules':  [],
-                                 'stdincludes': []
+                                 'stdincludes': [],
+                                 'modflag':     '-J',
+                                 'archiver':    'ar rcs '
                                  }
                        }
           }
@@ -90,104 +103,6 @@ def remove_extenstions(string, suffix):
 
 ####################################################################################################
 
-def is_quoted(line, position):
-    '''
-    Check whether selected <position> is quoted.
-
-    Arguments:
-        line     - line for search  [string or list of chars]
-        position - position to be tested [int]
-
-    Return:
-        boolean
-    '''
-    quotes = chr(34)+chr(39)
-
-    if not any([(quote in line) for quote in quotes]):
-        return False
-
-    if position > len(line) or position < 0:
-        raise IndexError('Inquired position is beyond the string.')
-
-    status = None
-    for pos, symbol in enumerate(line):
-        if pos == position:
-            return bool(status)
-
-        if symbol in quotes:
-            current_quote = symbol
-
-            if status is None:
-                status = current_quote
-            elif status == current_quote:
-                status = None
-
-    raise FortranSyntaxError(f'Probably quotes are not balanced: ({line})')
-
-####################################################################################################
-
-def dequote(line):
-    '''
-    Gentle quotes stripping.
-    '''
-    while True:
-        if line.startswith('"') or line.startswith("'"):
-            line = line[1:]
-        else:
-            break
-
-    while True:
-        if line.endswith('"') or line.endswith("'"):
-            line = line[:-1]
-        else:
-            break
-    return line
-
-####################################################################################################
-
-def is_keyword(line, keyword, before=False):
-    '''
-    Check whether <line> contains <keyword>.
-
-    Arguments:
-        line    - line for search
-        keyword - keyword that is being looked for
-        before  - set True if need guarantee previous symbol to be non-alphabetic
-
-    Returns:
-        boolean
-    '''
-    try:
-        ln, pos = len(keyword), line.index(keyword)
-    except ValueError:  # keyword is not found in the line
-        return False
-
-    # keyword len is equal to line len
-    if ln+pos >= len(line):
-        return True
-
-    extra = True
-    if before:
-        if pos != 0:
-            if line[pos-1].isalpha():  # previous symbol is letter
-                extra = False
-
-    return not is_quoted(line, pos) and not line[ln+pos].isalpha() and extra
-
-####################################################################################################
-
-def extract_element_name(string):
-    '''
-    Get the name given to element.
-        e.g. subroutine hello(world) returns hello
-    '''
-
-    # find first symbol that is not allowed to use in names.
-    result = re.search('[^a-zA-Z0-9_]', string)
-    return string[:result.start()] if result else string
-
-####################################################################################################
-
 def replace_extension(filename, extensions, object_extension):
     '''
     Convert source file name into object file name.
@@ -224,23 +139,97 @@ def get_wrapped_line(objects, prefix='', postfix='', sep=' ', width=80, end='\\'
     Return:
         multiline block
     '''
-    indent = ''
-    if adjust:
-        indent = ' '*len(prefix)
+    indent = ' '*len(prefix) if adjust else ''
 
-    raw, result, line = objects[:], '', prefix
-    while raw:
-        if len(line+sep+raw[0])+len(end)+1 > width:
-            free_space = ' '*(width-len(line)-len(end))
+    lines, line, length = [], [prefix], len(prefix)
+    for k, obj in enumerate(objects):
+        if k and length+len(sep)+len(obj)+len(end)+1 > width:
+            lines.append(''.join(line) + ' '*(width-length-len(end)) + end)
+            line, length = [indent], len(indent)
 
-            result += line + free_space + end + '\n'
-            if adjust:
-                line = indent
-            continue
-        line += raw.pop(0)+sep
-    result += line.rstrip(sep)
+        line += [obj, sep]
+        length += len(obj)+len(sep)
+    lines.append(''.join(line).rstrip(sep))
+
+    return '\n'.join(lines) + postfix
+
+####################################################################################################
+
+def write_if_changed(path, text):
+    '''
+    Write <text> into the file only if its contents differ. The file is replaced atomically
+    (temporary file is renamed), so its modification time is kept when nothing changed.
+
+    Arguments:
+        path - filename
+        text - file contents
+
+    Returns:
+        True if the file was written
+    '''
+    try:
+        with open(path, encoding='utf-8') as stream:
+            if stream.read() == text:
+                return False
+        mode = os.stat(path).st_mode & 0o7777
+    except FileNotFoundError:
+        umask = os.umask(0)
+        os.umask(umask)
+        mode = 0o666 & ~umask
+    except (OSError, UnicodeDecodeError):
+        mode = 0o644
+
+    import tempfile
+
+    handle, temporary = tempfile.mkstemp(prefix=f'.{os.path.basename(path)}.',
+                                         dir=os.path.dirname(os.path.abspath(path)))
+    try:
+        with os.fdopen(handle, 'w', encoding='utf-8') as stream:
+            stream.write(text)
+        os.chmod(temporary, mode)
+        os.replace(temporary, path)
+    except BaseException:
+        os.unlink(temporary)
+        raise
+
+    return True
 
-    return result + postfix
+####################################################################################################
+
+def make_supports_grouped_targets(make='make'):
+    '''
+    Check whether <make> supports grouped targets (&:), that is GNU make 4.3 or newer.
+    '''
+    import subprocess
+
+    try:
+        output = subprocess.run([make, '--version'], stdout=subprocess.PIPE,
+                                stderr=subprocess.DEVNULL, universal_newlines=True).stdout
+    except OSError:
+        return False
+
+    version = re.match(r'GNU Make (\d+)\.(\d+)', output)
+    return bool(version) and (int(version.group(1)), int(version.group(2))) >= (4, 3)
+
+####################################################################################################
+
+def module_filename(module):
+    '''
+    Get the name of the compiled interface file: module.mod for a module, ancestor@name.smod
+    for a submodule (identified as ancestor@name), module.smod for module@ (interface of the
+    module required by its submodules).
+    '''
+    if '@' not in module:
+        return f'{module}.mod'
+    return f'{module.rstrip("@")}.smod'
+
+####################################################################################################
+
+def ninja_escape(path):
+    '''
+    Escape special symbols of the path for ninja build file.
+    '''
+    return str(path).replace('$', '$$').replace(' ', '$ ').replace(':', '$:')
 
 ####################################################################################################
 
@@ -255,7 +244,14 @@ def has_extension(file, extensions):
     Returns:
         boolean
     '''
-    return any([file.endswith(e) for e in extensions])
+    return os.path.splitext(file)[1] in extension_set(tuple(extensions))
+
+@functools.lru_cache(maxsize=None)
+def extension_set(extensions):
+    '''
+    Get the set of <extensions> (with leading dots) for constant time lookup.
+    '''
+    return frozenset(e if e.startswith('.') else '.' + e for e in extensions)
 
 ####################################################################################################
 
@@ -266,6 +262,8 @@ def draw_directory_tree(fileset):
     Arguments:
         fileset     - set of files (with pathes)
     '''
+    import treelib
+
     known, tree = {'Project': 0}, treelib.Tree()
 
     tree.create_node('Project', 0)
@@ -288,261 +286,1535 @@ def expand_path(path):
 
 ####################################################################################################
 
-def collect_files(directory, ignore_paths, extensions):
-        '''
-        Collect files for the project stored in <directory>.
+def collect_files(directory, ignore_paths, extensions, collector='walk'):
+    '''
+    Collect files for the project stored in <directory>. Ignored subdirectories are not
+    entered at all.
 
-        Arguments:
-            directory    - directory to proceed
-            ignore_paths - subdirectories to be excluded
-            extensions   - the set of extensions
-        '''
+    Arguments:
+        directory    - directory to proceed
+        ignore_paths - subdirectories (or glob patterns, see ignore_matcher) to be excluded
+        extensions   - the set of extensions
+        collector    - walk (scan the directory tree) or git (take files from the git index
+                       and untracked files not excluded by .gitignore, falls back to walk
+                       outside of git repository)
 
-        # add project prefix for ignored directories
-        ignored_paths = [str(Path(directory) / path) for path in ignore_paths]
+    Returns:
+        sorted list of files, so the order does not depend on collector and file system
+    '''
+    extensions = extension_set(tuple(extensions))
+    matcher = ignore_matcher(tuple(ignore_paths)) or (lambda path: False)
 
-        fileset = []
-        for (dirpath, _, files) in os.walk(directory):
+    if collector == 'git':
+        files = list_git_files(directory)
+        if files is not None:
+            fileset = []
             for file in files:
+                if os.path.splitext(file)[1] in extensions and not matcher(file):
+                    path = str(Path(directory) / file)
 
-                # it fits one of extensions
-                if has_extension(file, extensions):
-                    path = str(Path(dirpath) / file)
-
-                    for ignored in ignored_paths:
-                        if path.startswith(ignored):
-                            break
-                    else:
+                    # removed from the working tree but not from the index yet
+                    if os.path.lexists(path):
                         fileset.append(path)
+            return sorted(fileset)
+
+        logger.warning('%s is not a git repository, walk the directory tree.', directory)
 
-        return fileset
+    fileset = []
+
+    def walk(path, relative):
+        try:
+            with os.scandir(path) as iterator:
+                entries = list(iterator)
+        except OSError:
+            return
+
+        prefix = str(Path(path))
+        subdirectories = []
+        for entry in entries:
+            name = relative + entry.name
+            try:
+                is_directory = entry.is_dir()
+            except OSError:
+                is_directory = False
+
+            # like os.walk, symbolic links to directories are not followed
+            if is_directory:
+                if not entry.is_symlink() and not matcher(name):
+                    subdirectories.append((entry.path, name + '/'))
+
+            elif os.path.splitext(entry.name)[1] in extensions and not matcher(name):
+                fileset.append(entry.name if prefix == '.' else os.path.join(prefix, entry.name))
+
+        for subdirectory in subdirectories:
+            walk(*subdirectory)
+
+    walk(directory, '')
+
+    return sorted(fileset)
+
+####################################################################################################
+
+def list_git_files(directory):
+    '''
+    Get files of the git repository at <directory>: tracked ones (from the index) and untracked
+    ones not excluded by .gitignore.
+
+    Returns:
+        list of paths relative to the <directory>, None if git is not available or
+        <directory> is not in a repository
+    '''
+    import subprocess
+
+    try:
+        result = subprocess.run(['git', '-C', str(directory), 'ls-files', '-z', '--cached',
+                                 '--others', '--exclude-standard'],
+                                stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    except OSError:
+        return None
+
+    if result.returncode:
+        return None
+
+    # files with merge conflicts are listed once per stage
+    return list(dict.fromkeys(os.fsdecode(path) for path in result.stdout.split(b'\0') if path))
 
 ####################################################################################################
 
-def purify_include(path):
+GLOB_CHARACTERS = re.compile(r'[*?\[]')
+
+def glob_to_regex(pattern):
+    '''
+    Translate glob <pattern> into regular expression: * and ? do not match /, ** matches
+    any number of directories, [...] is a character class ([!...] is negated one).
+    '''
+    regex, k = [], 0
+    while k < len(pattern):
+        if pattern.startswith('**/', k):
+            regex.append('(?:.*/)?')
+            k += 3
+        elif pattern.startswith('**', k):
+            regex.append('.*')
+            k += 2
+        elif pattern[k] == '*':
+            regex.append('[^/]*')
+            k += 1
+        elif pattern[k] == '?':
+            regex.append('[^/]')
+            k += 1
+        elif pattern[k] == '[' and pattern.find(']', k+2) > 0:
+            end = pattern.find(']', k+2)
+            body = pattern[k+1:end]
+            regex.append('[' + ('^' + body[1:] if body.startswith('!') else body) + ']')
+            k = end + 1
+        else:
+            regex.append(re.escape(pattern[k]))
+            k += 1
+    return ''.join(regex)
+
+@functools.lru_cache(maxsize=None)
+def ignore_matcher(ignore_paths):
+    '''
+    Compile ignored paths into a single matcher of paths relative to the project directory
+    (with / separators). A path is matched together with everything below it.
+
+    Plain paths (lib, src/old) are taken from the project directory: lib matches lib and
+    lib/a.f90, but not lib2. Glob patterns follow .gitignore rules: pattern without slash
+    (*.bak, build*) matches a name at any depth, pattern with slash (src/*/tests, /vendor*,
+    **/generated) is taken from the project directory.
+
+    Arguments:
+        ignore_paths - tuple of paths and patterns
+
+    Returns:
+        function matching relative path or None if nothing is ignored
+    '''
+    alternatives = []
+    for pattern in ignore_paths:
+        pattern = pattern.strip().replace('\\', '/')
+        while pattern.startswith('./'):
+            pattern = pattern[2:]
+        pattern = pattern.rstrip('/')
+        if not pattern.strip('/'):
+            continue
+
+        if GLOB_CHARACTERS.search(pattern):
+            anchored = '/' in pattern
+            regex = glob_to_regex(pattern.lstrip('/'))
+            alternatives.append(regex if anchored else '(?:.*/)?' + regex)
+        else:
+            alternatives.append(re.escape(os.path.normpath(pattern).replace('\\', '/')
+                                          .lstrip('/')))
+
+    if not alternatives:
+        return None
+
+    return re.compile('(?:%s)(?:/.*)?' % '|'.join(alternatives), re.DOTALL).fullmatch
+
+def is_ignored(path, directory, ignore_paths):
     '''
-    Extract name from 'include' statement.
+    Check whether <path> is located in one of ignored subdirectories (or matches one of
+    ignored patterns, see ignore_matcher).
+
+    Arguments:
+        path         - path to be tested
+        directory    - project directory
+        ignore_paths - subdirectories to be excluded
     '''
-    return dequote(path.strip().split(' ', 1)[1].strip())
+    matcher = ignore_matcher(tuple(ignore_paths))
+    if matcher is None:
+        return False
+
+    relative = os.path.relpath(path, directory).replace(os.sep, '/')
+    return bool(matcher(relative))
 
 ####################################################################################################
 
-def read_with_encoding_guess(file, *, debug=False, encoding=None, **kwargs):
+ENCODING_GUESSES = ['utf-8', 'windows-1251', 'cp866', 'ascii', 'windows-1252']
+
+def decode_with_encoding_guess(data, *, encoding=None, hint=None):
     '''
-    Try to guess encoding of the file. Function is called to solve the problem
+    Try to guess encoding of the raw <data>. Function is called to solve the problem
     with cyrillic comments.
 
     Arguments:
-        file     - filename
-        debug    - show debug information
-        encoding - force to use encoding, if is given will skip guess procedure
-        kwargs   - keyword arguments of the open function
+        data     - file contents [bytes]
+        encoding - force to use encoding, if is not one of the guesses will skip guess procedure
+        hint     - encoding to be tried first (e.g. remembered from the previous run)
+
+    Returns:
+        (text, encoding)
     '''
-    guesses = ['utf-8', 'windows-1251', 'cp866', 'ascii', 'windows-1252']
 
     # in case of incorrect encoding will raise UnicodeDecodeError
-    if encoding and encoding not in guesses:
-        return open(file, encoding=encoding, **kwargs).readlines()
+    if encoding and encoding not in ENCODING_GUESSES:
+        return data.decode(encoding), encoding
 
-    if debug:
-        print(f'Reading file {file}.')
+    # Fortran keywords and identifiers are ASCII, so most of the files need no guess
+    if data.isascii():
+        return data.decode('ascii'), 'ascii'
 
-    notutf = False
-    for encoding_ in guesses:
+    for encoding_ in ([hint] if hint else []) + ENCODING_GUESSES:
         try:
-            result = open(file, encoding=encoding_, **kwargs).readlines()
-            if notutf and debug:
-                print(f'Success in reading with {encoding_} encoding.')
-            return result
-
-        except UnicodeDecodeError:
-            notutf = True
+            return data.decode(encoding_), encoding_
+        except (UnicodeDecodeError, LookupError):
             pass
 
-    raise UnicodeDecodeError(f'Unable to guess encoding. None of {guesses}.')
+    raise UnicodeError(f'Unable to guess encoding. None of {ENCODING_GUESSES}.')
 
 ####################################################################################################
 
-class ProjectParser:
+def read_with_encoding_guess(file, *, debug=False, encoding=None, stamps=None):
     '''
-    Class for Fortran project analysis.
+    Read the file (once) and guess its encoding.
+
+    Arguments:
+        file     - filename
+        debug    - show debug information
+        encoding - force to use encoding, if is not one of the guesses will skip guess procedure
+        stamps   - dictionary to be updated with the stamp of the file (mtime, size, hash and
+                   encoding), the encoding stored there is tried first
+
+    Returns:
+        list of lines
     '''
-    DEFAULTS = {
-                'drop_execute_flag': True,
-                'verbose':           True,
-                'debug':             False,
-                'encoding':          'utf-8',
-                'extensions':        ['.f90', '.F90', '.f', '.F', '.for', '.FOR'],
-                'compiler':          'ifort',
-                'appname':           'appname',
-                'object_extension':  '.obj',
-                'dependency':        'object files',
-                'makefile_name':     'Makefile',
-                'pcompiler_params':  PRESETS['ifort'][platform_]['pparams'],
-                'scompiler_params':  PRESETS['ifort'][platform_]['sparams'],
-                'ignore_paths':      [],
-                'ignore_modules':    PRESETS['ifort'][platform_]['stdmodules'],
-                'ignore_includes':   PRESETS['ifort'][platform_]['stdincludes'],
-               }
+    if debug:
+        print(f'Reading file {file}.')
 
-    def __init__(self, **kwargs):
-        '''
-        Arguments:
-            drop_execute_flag - make all source files not executable
-            verbose           - verbose process
-            debug             - print debug information
-            encoding          - encoding of source files
-            extensions        - the set of extensions
-            compiler          - compiler
-            appname           - application name
-            object_extension  - object files extension
-            dependency        - dependence mode (object files, modules)
-            makefile_name     - the name of makefile
-            pcompiler_params  - primary compiler parameters
-            scompiler_params  - secondary compiler parameters
-            ignore_paths      - the set of paths to be ignored
-            ignore_modules    - the set of available modules
-            ignore_includes   - the set of available include files
-        '''
-        check_arguments = set(kwargs) - set(ProjectParser.DEFAULTS)
-        if check_arguments:
-            raise KeyError(f'Unexpected argument(s): {list(check_arguments)}')
+    with open(file, 'rb') as stream:
+        data, stat = stream.read(), os.fstat(stream.fileno())
 
-        for key in ProjectParser.DEFAULTS:
-            if key in ('ignore_modules', 'ignore_includes'):
-                if key in kwargs:
-                    setattr(self, key, ProjectParser.DEFAULTS[key].extend(kwargs[key]))
-                    continue
+    hint = stamps.get(str(file), {}).get('encoding') if stamps else None
+    text, encoding_ = decode_with_encoding_guess(data, encoding=encoding, hint=hint)
 
-            setattr(self, key, kwargs.get(key, ProjectParser.DEFAULTS[key]))
+    if debug and encoding_ not in ('ascii', 'utf-8', hint):
+        print(f'Success in reading with {encoding_} encoding.')
 
-        self.includes = []
+    if stamps is not None:
+        stamps[str(file)] = {'mtime':    stat.st_mtime_ns,
+                             'size':     stat.st_size,
+                             'hash':     hashlib.sha1(data).hexdigest(),
+                             'encoding': encoding_}
 
-        appname = remove_extenstions(self.appname, ('.x', '.exe'))
-        if platform_ == 'Linux':
-            self.appname = appname + '.x'
-        elif platform_ == 'Windows':
-            self.appname = appname + '.exe'
+    return text.splitlines()
 
-    def parse_source_file(self, file):
+####################################################################################################
 
-        filecontains = {'modules': [], 'subroutines': [], 'functions': [],
-                        'dependencies': [], 'includes': [], 'entry_point': False}
+FIXED_FORM_EXTENSIONS = frozenset(['.f', '.for', '.f77', '.ftn'])
+FREE_FORM_EXTENSIONS = frozenset(['.f90', '.f95', '.f03', '.f08'])
+
+# characters breaking the plain scan of a line: quotes, comment, statement separator, continuation
+SPECIAL_CHARACTERS = re.compile('[\'"!;&]')
+
+# all statements of interest are classified with one match, the kind is the name of matched group
+STATEMENT_PATTERN = re.compile(r'''
+     (?P<end_interface>end\s*interface\b)
+    |(?P<end>end(?:\s*(?:function|subroutine|module|submodule|program|procedure))?\b)
+    |(?P<interface>(?:abstract\s+)?interface\b)
+    |(?P<module>module\s+(?!(?:procedure|function|subroutine)\b)(?P<module_name>\w+)\s*$)
+    |(?P<submodule>submodule\s*\(\s*(?P<submodule_ancestor>\w+)\s*
+                   (?::\s*(?P<submodule_parent>\w+)\s*)?\)\s*(?P<submodule_name>\w+)\s*$)
+    |(?P<include>include\s*(?P<include_name>'[^']*'|"[^"]*"))
+    |(?P<use>use\b(?:\s*,\s*(?P<use_nature>(?:non_)?intrinsic))?\s*(?:::)?\s*(?P<use_name>\w+))
+    |(?P<program>program\s+(?P<program_name>\w+))
+    |(?P<subroutine>(?:(?:pure|impure|elemental|recursive|non_recursive|module)\s+)*
+                    subroutine\s+(?P<subroutine_name>\w+))
+    |(?P<function>(?:[\w\s,*=]|\([^)]*\))*?\bfunction\s+(?P<function_name>\w+)\s*\()
+''', re.IGNORECASE | re.VERBOSE)
+
+# call sites and possible function references (any name followed by parenthesis, e.g. arrays)
+REFERENCE_PATTERN = re.compile(r'\bcall\s+(\w+)|\b([a-z]\w*)\s*\(', re.IGNORECASE)
+
+# procedures named without calling them: external and procedure declarations (passed as
+# actual arguments, procedure pointers), type-bound procedures and pointer assignment targets
+DECLARATION_PATTERN = re.compile(r'\b(?:external|procedure)\b(?P<names>.*)|=>(?P<targets>.*)',
+                                 re.IGNORECASE)
 
-        non_interfaced = True
+####################################################################################################
 
-        # assume that key statements are written without ;&!
-        for line in read_with_encoding_guess(file, debug=self.debug, encoding=self.encoding):
+def is_fixed_form(file, default=False):
+    '''
+    Check whether <file> is written in fixed source form (judging by extension).
 
-            # cut comment if exist
-            if '!' in line and not is_quoted(line, line.index('!')):
-                line = line[:line.index('!')]
+    Arguments:
+        file    - filename
+        default - result for unknown extensions (e.g. included files)
 
-            uline = line.lower().strip()
-            statement, *other = uline.split(' ')
+    Returns:
+        boolean
+    '''
+    extension = os.path.splitext(str(file))[1].lower()
+    if extension in FIXED_FORM_EXTENSIONS:
+        return True
+    if extension in FREE_FORM_EXTENSIONS:
+        return False
+    return default
 
-            if not other:
-                continue
+####################################################################################################
 
-            if is_keyword(statement, 'interface'):
-                non_interfaced = False
-                continue
+def iter_statements(lines, fixed_form=False, line_length=72):
+    '''
+    Split source lines into statements. Every line is scanned once: comments are stripped,
+    continuation lines are joined and ;-separated statements are split (quotes are respected).
 
-            if uline.startswith('end interface') or uline.startswith('endinterface'):
-                non_interfaced = True
-                continue
+    Arguments:
+        lines       - source lines
+        fixed_form  - apply fixed form rules (column 1 comments, column 6 continuation)
+        line_length - fixed form text after this column is ignored (e.g. 132 for sources
+                      compiled with -ffixed-line-length-132 or -extend-source)
 
-            if is_keyword(statement, 'module') and other[0] != 'procedure':
-                module_name = other[0].strip()
-                if module_name not in filecontains['modules']:
-                    filecontains['modules'].append(module_name)
-                self.modules[module_name] = file
-                continue
+    Yields:
+        statements (stripped, initial case)
+    '''
+    fragments, quote, pending = [], None, False
 
-            if is_keyword(statement, 'include'):
+    for line in lines:
+        line = line.rstrip('\r\n')
 
-                # initial case (not lowered) is required due to UNIX case sensitivity
-                include_source = purify_include(line)
-                if include_source in self.ignore_includes:
-                    continue
+        if fixed_form:
+            if not line.strip() or line[0] in 'cC*!' or line.lstrip().startswith('!'):
+                continue
 
-                include_file = Path(file).parent / include_source
+            # tab format: tab followed by nonzero digit marks continuation line
+            if line[0] == '\t':
+                continued = line[1:2] in tuple('123456789')
+                text = line[2:] if continued else line[1:]
+            else:
+                continued = line[5:6] not in ('', ' ', '0')
+                text = line[6:line_length]
+
+            if not continued:
+                statement = ''.join(fragments).strip()
+                if statement:
+                    yield statement
+                fragments, quote = [], None
+
+            # blanks are insignificant in fixed form, so keyword may be followed by name
+            # from the continuation line (USE / &MOD2)
+            elif not quote:
+                text = ' ' + text
+        else:
+            text = line
+            if pending:
+                stripped = text.lstrip()
+                if not stripped or stripped.startswith('!'):
+                    continue
+                if stripped.startswith('&'):
+                    text = stripped[1:]
 
-                self.includes.append(include_file)
+        start = position = 0
+        pending = False
+        while True:
+            match = SPECIAL_CHARACTERS.search(text, position)
+            if match is None:
+                break
 
-                filecontains['includes'].append(include_file)
-                result = self.parse_source_file(include_file)
+            symbol, position = match.group(), match.end()
 
-                for key in result:
-                    if key != 'entry_point':
-                        for val in result[key]:
-                            if val not in filecontains[key]:
-                                filecontains[key].append(val)
+            if symbol == '&':
+                if not fixed_form:
+                    rest = text[position:].lstrip()
+                    if not rest or (not quote and rest.startswith('!')):
+                        text, pending = text[:match.start()], True
+                        break
                 continue
 
-            if is_keyword(statement, 'subroutine') and non_interfaced:
-                subroutine_name = extract_element_name(other[0])
-                if subroutine_name not in filecontains['subroutines']:
-                    filecontains['subroutines'].append(subroutine_name)
-                self.subroutines[subroutine_name] = file
-                continue
+            if quote:
+                if symbol == quote:
+                    quote = None
+            elif symbol in '\'"':
+                quote = symbol
+            elif symbol == '!':
+                text = text[:match.start()]
+                break
+            elif symbol == ';':
+                fragments.append(text[start:match.start()])
+                statement = ''.join(fragments).strip()
+                if statement:
+                    yield statement
+                fragments, start = [], position
 
-            if is_keyword(statement, 'program'):
-                if self.entry_point:
-                    print('>>', self.entry_point['name'], 'in', self.entry_point['location'])
-                    print('>>', other[0], 'in', file)
-                    print()
-                    raise FortranSyntaxError('Found more than one entry point.')
+        fragments.append(text[start:])
 
-                self.entry_point = {'name': other[0], 'location': file}
-                filecontains['entry_point'] = True
-                continue
+        if not fixed_form and not pending:
+            statement = ''.join(fragments).strip()
+            if statement:
+                yield statement
+            fragments, quote = [], None
 
-            if is_keyword(statement, 'use', True):
-                module = extract_element_name(other[0])
-                if module not in self.ignore_modules:
-                    if module not in filecontains['dependencies']:
-                        filecontains['dependencies'].append(module)
-                continue
+    statement = ''.join(fragments).strip()
+    if statement:
+        yield statement
 
-            if ('function' in uline and is_keyword(uline, 'function') and
-                not uline.startswith('end') and non_interfaced):
-                words = uline.split(' ')
-                position = words.index('function')+1
+####################################################################################################
 
-                function_name = extract_element_name(words[position])
-                filecontains['functions'].append(function_name)
-                self.functions[function_name] = file
-                continue
+# preprocessor directive line (#if, #ifdef, #define, #include, etc.)
+DIRECTIVE_PATTERN = re.compile(r'\s*#\s*(?P<directive>[a-z]+)\b\s*(?P<argument>.*?)\s*$')
+
+# tokens of #if conditions: numbers, identifiers and operators
+CONDITION_TOKENS = re.compile(r'\s*(\d+[uUlL]*|[A-Za-z_]\w*|'
+                              r'&&|\|\||==|!=|<=|>=|<<|>>|[-+*/%<>!~()&|^])')
+
+# binary operators of #if conditions: precedence and function
+CONDITION_OPERATORS = {
+                       '||': (1,  lambda a, b: int(bool(a) or bool(b))),
+                       '&&': (2,  lambda a, b: int(bool(a) and bool(b))),
+                       '|':  (3,  lambda a, b: a | b),
+                       '^':  (4,  lambda a, b: a ^ b),
+                       '&':  (5,  lambda a, b: a & b),
+                       '==': (6,  lambda a, b: int(a == b)),
+                       '!=': (6,  lambda a, b: int(a != b)),
+                       '<':  (7,  lambda a, b: int(a < b)),
+                       '>':  (7,  lambda a, b: int(a > b)),
+                       '<=': (7,  lambda a, b: int(a <= b)),
+                       '>=': (7,  lambda a, b: int(a >= b)),
+                       '<<': (8,  lambda a, b: a << b),
+                       '>>': (8,  lambda a, b: a >> b),
+                       '+':  (9,  lambda a, b: a + b),
+                       '-':  (9,  lambda a, b: a - b),
+                       '*':  (10, lambda a, b: a * b),
+                       '/':  (10, lambda a, b: int(a / b)),
+                       '%':  (10, lambda a, b: a - b*int(a / b)),
+                      }
 
-        return filecontains
+####################################################################################################
 
-    def parse_project(self):
-        self.entry_point = None
-        self.empty_files = []
+def preprocessor_definitions(params):
+    '''
+    Get macros defined by -D (/D) options of the compiler parameters <params> (-U options
+    remove them).
 
-        if self.debug:
-            print('========== PROJECT INFORMATION ==========\n')
+    Returns:
+        dictionary name -> value ('1' if value is not given)
+    '''
+    defines, tokens = {}, (params or '').split()
+    for k, token in enumerate(tokens):
+        if token[:2] not in ('-D', '/D', '-U', '/U'):
+            continue
 
-        self.structure, self.modules, self.functions, self.subroutines = {}, {}, {}, {}
-        for file in self.fileset:
+        # the name may be given as a separate argument
+        definition = token[2:] or (tokens[k+1] if k+1 < len(tokens) else '')
+        name, separator, value = definition.partition('=')
+        if not re.fullmatch(r'[A-Za-z_]\w*', name):
+            continue
 
-            contains = self.parse_source_file(file)
+        if token[1] == 'D':
+            defines[name] = value if separator else '1'
+        else:
+            defines.pop(name, None)
 
-            is_empty = not any([bool(item) for item in contains.items()])
-            if is_empty:
-                self.empty_files.append(file)
+    return defines
 
-            if self.debug:
-                width = max([len(key) for key in contains.keys()])
-                print('*** File [%s]' % file, end=' ')
-                if not is_empty:
-                    print('info:')
+####################################################################################################
+
+# reserved names are left for macros predefined by compilers (_OPENMP, __GFORTRAN__, etc.)
+RESERVED_MACRO = re.compile(r'_[A-Z_]\w*')
+
+def is_unknown_macro(name, defines):
+    '''
+    Check whether it is unknown if the macro <name> is defined: macros defined differently
+    by the configurations (None values of <defines>) and undefined reserved names, which
+    may be predefined by the compiler or its options (e.g. _OPENMP with -fopenmp).
+    '''
+    if name in defines:
+        return defines[name] is None
+    return RESERVED_MACRO.fullmatch(name) is not None
+
+####################################################################################################
+
+def evaluate_condition(expression, defines):
+    '''
+    Evaluate condition of #if (#elif) directive with C preprocessor rules: defined(NAME) and
+    integer arithmetic, undefined names are zeros.
+
+    Arguments:
+        expression - condition
+        defines    - dictionary of macros, name -> value (None if it is unknown whether the
+                     macro is defined, see is_unknown_macro)
+
+    Returns:
+        True, False or None if condition cannot be evaluated (e.g. uses function-like or
+        unknown macros)
+    '''
+    expression = re.sub(r'/\*.*?\*/', ' ', expression).split('//')[0].strip()
+
+    tokens, position = [], 0
+    while position < len(expression):
+        match = CONDITION_TOKENS.match(expression, position)
+        if match is None:
+            return None
+        tokens.append(match.group(1))
+        position = match.end()
+        if not expression[position:].strip():
+            break
+
+    def value(name, depth=0):
+        if is_unknown_macro(name, defines):
+            raise ValueError(name)
+
+        # object-like macros are expanded to numbers or other macros
+        text = defines.get(name, '0').strip() or '0'
+        if re.fullmatch(r'[A-Za-z_]\w*', text) and depth < 16:
+            return value(text, depth+1) if text in defines else 0
+        return int(text.rstrip('uUlL'), 0)
+
+    position = 0
+
+    def unary():
+        nonlocal position
+        token = tokens[position]
+        position += 1
+
+        if token == '(':
+            result = binary(1)
+            if tokens[position] != ')':
+                raise ValueError(expression)
+            position += 1
+            return result
+
+        if token == '!':
+            return int(not unary())
+        if token == '-':
+            return -unary()
+        if token == '+':
+            return unary()
+        if token == '~':
+            return ~unary()
+
+        if token == 'defined':
+            parenthesized = tokens[position] == '('
+            name = tokens[position+1] if parenthesized else tokens[position]
+            position += 3 if parenthesized else 1
+            if is_unknown_macro(name, defines):
+                raise ValueError(name)
+            return int(name in defines)
+
+        if token[0].isdigit():
+            return int(token.rstrip('uUlL'), 0)
+
+        if token[0].isalpha() or token[0] == '_':
+            if position < len(tokens) and tokens[position] == '(':
+                raise ValueError(expression)
+            return value(token)
+
+        raise ValueError(expression)
+
+    def binary(level):
+        nonlocal position
+        result = unary()
+        while (position < len(tokens) and tokens[position] in CONDITION_OPERATORS and
+               CONDITION_OPERATORS[tokens[position]][0] >= level):
+            precedence, function = CONDITION_OPERATORS[tokens[position]]
+            position += 1
+            result = function(result, binary(precedence+1))
+        return result
+
+    try:
+        result = binary(1)
+    except (ValueError, IndexError, ZeroDivisionError):
+        return None
+
+    return bool(result) if position == len(tokens) else None
+
+####################################################################################################
+
+def preprocess_lines(lines, defines, include=None):
+    '''
+    Evaluate preprocessor directives: keep lines of the active #if/#ifdef/#ifndef branches
+    only, update macros with #define and #undef, report #include. Branches of conditions
+    which cannot be evaluated are all kept (as if there were no preprocessor).
+
+    Arguments:
+        lines   - source lines
+        defines - dictionary of macros, name -> value (is updated)
+        include - function called for every active #include with the name of the included
+                  file (where it appears in the lines)
+
+    Yields:
+        lines of the active branches (directives are dropped)
+    '''
+    # stack of (parent is active, state of the conditional: searching, taken, unknown)
+    stack, active = [], True
+
+    lines = iter(lines)
+    for line in lines:
+
+        match = DIRECTIVE_PATTERN.match(line) if '#' in line else None
+        if match is None:
+            if active:
+                yield line
+            continue
+
+        # directive continued with backslash
+        while line.rstrip().endswith('\\'):
+            line = line.rstrip()[:-1] + next(lines, '')
+            match = DIRECTIVE_PATTERN.match(line)
+
+        directive, argument = match.group('directive').lower(), match.group('argument')
+
+        if directive in ('if', 'ifdef', 'ifndef'):
+            if directive == 'if':
+                condition = evaluate_condition(argument, defines)
+            else:
+                name = argument.split()[0] if argument.split() else ''
+                condition = (name in defines) == (directive == 'ifdef')
+                if is_unknown_macro(name, defines):
+                    condition = None
+
+            if not active:
+                stack.append((False, 'taken'))
+            elif condition is None:
+                stack.append((True, 'unknown'))
+            else:
+                stack.append((True, 'taken' if condition else 'searching'))
+                active = condition
+
+        elif directive in ('elif', 'else') and stack:
+            parent, state = stack[-1]
+            if state == 'unknown':
+                active = parent
+            elif state == 'taken':
+                active = False
+            else:
+                condition = True if directive == 'else' else evaluate_condition(argument, defines)
+                if condition is None:
+                    stack[-1], active = (parent, 'unknown'), parent
+                elif condition:
+                    stack[-1], active = (parent, 'taken'), parent
+
+        elif directive == 'endif' and stack:
+            active = stack.pop()[0]
+
+        elif not active:
+            continue
+
+        elif directive == 'define':
+            definition = re.match(r'([A-Za-z_]\w*)(\(.*?\))?\s*(.*)', argument)
+            if definition:
+                defines[definition.group(1)] = definition.group(3)
+
+        elif directive == 'undef':
+            defines.pop(argument.split()[0] if argument.split() else '', None)
+
+        elif directive == 'include' and include is not None:
+            name = re.match(r'["<]([^">]+)[">]', argument)
+            if name:
+                include(name.group(1))
+
+####################################################################################################
+
+def scan_source_file(file, *, debug=False, encoding=None, ignore_modules=(), ignore_includes=(),
+                     fixed_form=None, stamps=None, memo=None, chain=None, spans=None,
+                     defines=None, references=False, line_length=72):
+    '''
+    Read the source <file> and collect its contents (included files are scanned as well).
+    Function has no side effects, so it can be called in a worker process.
+
+    Arguments:
+        file            - filename
+        debug           - show debug information
+        encoding        - encoding of the source file
+        ignore_modules  - the set of available modules (are not treated as dependencies)
+        ignore_includes - the set of available include files (are not scanned)
+        fixed_form      - source form, if None is judged by extension
+        stamps          - dictionary to be filled with stamps of the file and included files
+                          (see read_with_encoding_guess)
+        memo            - dictionary to keep results of included files scanning, so every
+                          include file is scanned only once (within a run)
+        chain           - files being scanned (used to detect include cycles)
+        spans           - list to be filled with timings of reading and scanning the file and
+                          included files (see ProjectParser.add_hook), None to skip profiling
+        defines         - macros (name -> value) for evaluation of the preprocessor directives
+                          (see preprocess_lines), statements of inactive branches are skipped,
+                          #include files are scanned as well; None to ignore directives
+        references      - collect names of called subroutines and possibly referenced
+                          functions (calls), see REFERENCE_PATTERN
+        line_length     - length of fixed form lines (see iter_statements)
+
+    Returns:
+        dictionary with modules, submodules (name, ancestor module and parent, see
+        module_filename for naming), subroutines, functions, dependencies, includes, calls
+        and entry point
+    '''
+    started = time.perf_counter() if spans is not None else None
+
+    filecontains = {'modules': [], 'submodules': [], 'subroutines': [], 'functions': [],
+                    'dependencies': [], 'includes': [], 'calls': [], 'entry_point': False}
+
+    # there may be plenty of referenced names, so they are collected into dictionary
+    calls = {}
+
+    def append(key, value):
+        if value not in filecontains[key]:
+            filecontains[key].append(value)
+
+    fixed_form = is_fixed_form(file) if fixed_form is None else fixed_form
+
+    # macros defined by the file are seen by the files including it with #include only
+    if chain is None and defines is not None:
+        defines = dict(defines)
+    chain = chain or (os.path.normpath(file),)
+
+    def scan_include(include_source, preprocessed=False):
+
+        include_file = os.path.normpath(Path(file).parent / include_source)
+        include_form = is_fixed_form(include_file, fixed_form)
+
+        # headers of the preprocessor may be found with search paths of the compiler
+        if preprocessed and not os.path.isfile(include_file):
+            return
+
+        if include_file in chain:
+            raise FortranSyntaxError('Include cycle: ' + ' -> '.join(chain + (include_file,)))
+
+        append('includes', include_file)
+
+        include_defines = None
+        if defines is not None:
+            include_defines = defines if preprocessed else dict(defines)
+
+        # result of the included file depends on the macros defined before
+        memo_key = (include_file, include_form)
+        if defines is not None:
+            memo_key += (tuple(sorted(defines.items())),)
+
+        if memo is not None and memo_key in memo:
+            result, include_stamps, defined = memo[memo_key]
+        else:
+            include_stamps = {}
+            if stamps and include_file in stamps:
+                include_stamps[include_file] = stamps[include_file]
+
+            result = scan_source_file(include_file, debug=debug, encoding=encoding,
+                                      ignore_modules=ignore_modules,
+                                      ignore_includes=ignore_includes,
+                                      fixed_form=include_form,
+                                      stamps=include_stamps,
+                                      memo=memo,
+                                      chain=chain + (include_file,),
+                                      spans=spans,
+                                      defines=include_defines,
+                                      references=references,
+                                      line_length=line_length)
+            defined = dict(include_defines) if include_defines is not None else None
+            if memo is not None:
+                memo[memo_key] = result, include_stamps, defined
+
+        if stamps is not None:
+            stamps.update(include_stamps)
+
+        if preprocessed and defines is not None:
+            defines.clear()
+            defines.update(defined)
+
+        calls.update(dict.fromkeys(result['calls']))
+        for key in result:
+            if key not in ('entry_point', 'calls'):
+                for val in result[key]:
+                    append(key, val)
+
+    non_interfaced = True
+
+    lines = read_with_encoding_guess(file, debug=debug, encoding=encoding, stamps=stamps)
+    if spans is not None:
+        spans.append(('read', 'read', started, time.perf_counter()-started, {'file': file}))
+
+    def include_header(name):
+        if name not in ignore_includes:
+            scan_include(name, preprocessed=True)
+
+    if defines is not None:
+        lines = preprocess_lines(lines, defines, include=include_header)
+
+    for statement in iter_statements(lines, fixed_form, line_length):
+
+        if references:
+            for called, referenced in REFERENCE_PATTERN.findall(statement):
+                calls[(called or referenced).lower()] = None
+            match = DECLARATION_PATTERN.search(statement)
+            if match:
+                names = match.group('names') or match.group('targets')
+                calls.update(dict.fromkeys(re.findall(r'[a-z_]\w*', names.lower())))
+
+        match = STATEMENT_PATTERN.match(statement)
+        if match is None:
+            continue
+
+        kind = match.lastgroup
+
+        if kind == 'interface':
+            non_interfaced = False
+
+        elif kind == 'end_interface':
+            non_interfaced = True
+
+        elif kind == 'module':
+            append('modules', match.group('module_name').lower())
+
+        elif kind == 'submodule':
+
+            # submodule is identified as ancestor@name (the name of its .smod file), parent is
+            # either another submodule or the ancestor module (ancestor@ stands for its .smod)
+            ancestor = match.group('submodule_ancestor').lower()
+            parent = (match.group('submodule_parent') or '').lower()
+            submodule = {'name':     f'{ancestor}@{match.group("submodule_name").lower()}',
+                         'ancestor': ancestor,
+                         'parent':   f'{ancestor}@{parent}'}
+            append('submodules', submodule)
+            if ancestor not in ignore_modules:
+                append('dependencies', ancestor)
+                append('dependencies', submodule['parent'])
+
+        elif kind == 'include':
+
+            # initial case (not lowered) is required due to UNIX case sensitivity
+            include_source = match.group('include_name')[1:-1].strip()
+            if include_source not in ignore_includes:
+                scan_include(include_source)
+
+        elif kind == 'subroutine':
+            if non_interfaced:
+                append('subroutines', match.group('subroutine_name').lower())
+
+        elif kind == 'program':
+            filecontains['entry_point'] = match.group('program_name').lower()
+
+        elif kind == 'use':
+            module = match.group('use_name').lower()
+            intrinsic = (match.group('use_nature') or '').lower() == 'intrinsic'
+            if not intrinsic and module not in ignore_modules:
+                append('dependencies', module)
+
+        elif kind == 'function':
+            if non_interfaced:
+                append('functions', match.group('function_name').lower())
+
+    if spans is not None:
+        spans.append((file, 'include' if len(chain) > 1 else 'scan', started,
+                      time.perf_counter()-started, {'file': file}))
+
+    filecontains['calls'] = list(calls)
+    return filecontains
+
+####################################################################################################
+
+# included files scanned by the worker process (see scan_source_file, memo argument)
+worker_memo = None
+
+def init_scan_worker():
+    '''
+    Initialize worker process for parallel scanning.
+    '''
+    global worker_memo
+    worker_memo = {}
+
+def scan_source_task(task, profile=False, **settings):
+    '''
+    Worker for parallel scanning.
+
+    Arguments:
+        task     - pair of filename and stamps known from the previous run
+        profile  - collect timings of scanning
+        settings - keyword arguments of scan_source_file
+
+    Returns:
+        (file contents, stamps of the file and included files, timings or None)
+    '''
+    file, stamps = task
+    settings.setdefault('memo', worker_memo)
+
+    spans = [] if profile else None
+    contains = scan_source_file(file, stamps=stamps, spans=spans, **settings)
+
+    if spans:
+        for span in spans:
+            span[-1]['worker'] = os.getpid()
+
+    return contains, stamps, spans
+
+####################################################################################################
+
+def topological_sort(nodes, edges):
+    '''
+    Order <nodes> so that every node follows all its predecessors (Kahn's algorithm).
+
+    Arguments:
+        nodes - list of nodes (defines the order of independent nodes)
+        edges - dictionary node -> list of successors
+
+    Returns:
+        (list of ordered nodes, list of nodes which cannot be ordered due to cycles)
+    '''
+    indegree = dict.fromkeys(nodes, 0)
+    for node in nodes:
+        for successor in edges.get(node, ()):
+            indegree[successor] += 1
+
+    queue, ordered = collections.deque(node for node in nodes if not indegree[node]), []
+    while queue:
+        node = queue.popleft()
+        ordered.append(node)
+        for successor in edges.get(node, ()):
+            indegree[successor] -= 1
+            if not indegree[successor]:
+                queue.append(successor)
+
+    return ordered, [node for node in nodes if indegree[node]]
+
+####################################################################################################
+
+def strongly_connected_components(nodes, edges):
+    '''
+    Find strongly connected components of the graph (iterative Tarjan's algorithm).
+
+    Arguments:
+        nodes - list of nodes to start search from
+        edges - dictionary node -> list of successors
+
+    Returns:
+        list of components (lists of nodes)
+    '''
+    index, lowlink, stack, onstack, components = {}, {}, [], set(), []
+
+    def visit(node):
+        index[node] = lowlink[node] = len(index)
+        stack.append(node)
+        onstack.add(node)
+        return node, iter(edges.get(node, ()))
+
+    for root in nodes:
+        if root in index:
+            continue
+
+        work = [visit(root)]
+        while work:
+            node, successors = work[-1]
+            for successor in successors:
+                if successor not in index:
+                    work.append(visit(successor))
+                    break
+                if successor in onstack:
+                    lowlink[node] = min(lowlink[node], index[successor])
+            else:
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    lowlink[parent] = min(lowlink[parent], lowlink[node])
+
+                if lowlink[node] == index[node]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        onstack.discard(member)
+                        component.append(member)
+                        if member == node:
+                            break
+                    components.append(component)
+
+    return components
+
+####################################################################################################
+
+def find_cycle(component, edges):
+    '''
+    Find a closed path inside the strongly connected <component>.
+
+    Returns:
+        list of nodes, the first and the last ones are the same
+    '''
+    members, path, position = set(component), [], {}
+
+    node = component[0]
+    while node not in position:
+        position[node] = len(path)
+        path.append(node)
+        node = next(successor for successor in edges[node] if successor in members)
+
+    return path[position[node]:] + [node]
+
+####################################################################################################
+
+def file_stamp(file, digest=True):
+    '''
+    Get the stamp used to detect changes of the file.
+
+    Arguments:
+        file   - filename
+        digest - if True, include hash of the file contents
+
+    Returns:
+        dictionary with mtime, size and (optionally) hash of the file
+    '''
+    stat = os.stat(file)
+    stamp = {'mtime': stat.st_mtime_ns, 'size': stat.st_size}
+    if digest:
+        with open(file, 'rb') as stream:
+            stamp['hash'] = hashlib.sha1(stream.read()).hexdigest()
+    return stamp
+
+####################################################################################################
+
+class ParseCache:
+    '''
+    Persistent storage for the results of source files parsing.
+
+    Entry is keyed by file path and stays valid while modification time, size and contents
+    of the file itself and of every file it includes are unchanged.
+    '''
+    VERSION = 8
+
+    def __init__(self, path, settings):
+        '''
+        Arguments:
+            path     - cache file name
+            settings - parser settings affecting the parse result, cache is dropped on change
+        '''
+        self.path, self.settings = str(path), settings
+        self.entries, self.changed = {}, False
+        self.hits, self.misses = 0, 0
+
+        try:
+            with open(self.path, encoding='utf-8') as stream:
+                data = json.load(stream)
+        except (OSError, ValueError):
+            return
+
+        if data.get('version') == ParseCache.VERSION and data.get('settings') == settings:
+            self.entries = data.get('entries', {})
+
+    def is_fresh(self, file, stamp):
+        '''
+        Check whether <file> still matches the <stamp>.
+        Contents hash is only computed when modification time changed, but size did not.
+        '''
+        try:
+            current = file_stamp(file, digest=False)
+        except OSError:
+            return False
+
+        if current['size'] != stamp['size']:
+            return False
+
+        if current['mtime'] != stamp['mtime']:
+            if file_stamp(file)['hash'] != stamp['hash']:
+                return False
+            stamp['mtime'], self.changed = current['mtime'], True
+
+        return True
+
+    def lookup(self, file):
+        '''
+        Get stored parse result for <file> or None if there is no valid one.
+        '''
+        entry = self.entries.get(str(file))
+        if entry and all(self.is_fresh(path, stamp) for path, stamp in entry['stamps'].items()):
+            self.hits += 1
+            return copy.deepcopy(entry['contains'])
+
+        self.misses += 1
+        return None
+
+    def hints(self, file):
+        '''
+        Get stamps of <file> and its includes known from the previous run (even outdated ones).
+        Only the encodings are kept, they are tried first while reading the files again.
+        '''
+        entry = self.entries.get(str(file), {})
+        return {path: {'encoding': stamp['encoding']}
+                for path, stamp in entry.get('stamps', {}).items() if 'encoding' in stamp}
+
+    def store(self, file, contains, stamps=None):
+        '''
+        Save parse result for <file>. Every included file is stamped as well.
+
+        Arguments:
+            file     - filename
+            contains - parse result
+            stamps   - stamps collected while reading the files (are created if missing)
+        '''
+        stamps, files = stamps or {}, [str(file)] + [str(path) for path in contains['includes']]
+        self.entries[str(file)] = {'stamps':   {path: stamps.get(path) or file_stamp(path)
+                                                for path in files},
+                                   'contains': copy.deepcopy(contains)}
+        self.changed = True
+
+    def save(self):
+        '''
+        Write cache to the disk (only if there are any changes).
+        '''
+        if not self.changed:
+            return
+
+        write_if_changed(self.path, json.dumps({'version':  ParseCache.VERSION,
+                                                'settings': self.settings,
+                                                'entries':  self.entries}))
+        self.changed = False
+
+####################################################################################################
+
+class ProjectParser:
+    '''
+    Class for Fortran project analysis.
+    '''
+    DEFAULTS = {
+                'drop_execute_flag': True,
+                'verbose':           True,
+                'debug':             False,
+                'encoding':          'utf-8',
+                'extensions':        ['.f90', '.F90', '.f', '.F', '.for', '.FOR'],
+                'compiler':          'ifort',
+                'appname':           'appname',
+                'object_extension':  '.obj',
+                'dependency':        'object files',
+                'makefile_name':     'Makefile',
+                'pcompiler_params':  PRESETS['ifort'][platform_]['pparams'],
+                'scompiler_params':  PRESETS['ifort'][platform_]['sparams'],
+                'ignore_paths':      [],
+                'ignore_modules':    PRESETS['ifort'][platform_]['stdmodules'],
+                'ignore_includes':   PRESETS['ifort'][platform_]['stdincludes'],
+                'cache':             None,
+                'jobs':              1,
+                'timestamp':         False,
+                'module_directory':  None,
+                'grouped_targets':   None,
+                'generator':         'make',
+                'compile_cache':     None,
+                'compile_cache_size': '5G',
+                'collector':         'walk',
+                'module_stamps':     False,
+                'build_directory':   None,
+                'configurations':    None,
+                'preprocess':        True,
+                'fragments_directory': None,
+                'reachability':      None,
+                'fixed_line_length': 72,
+               }
+
+    # parse cache used by command line (library does not write files into the project)
+    CACHE_FILE = '.fmakefile.cache'
+
+    # makefile recipes (configurations cannot be named after them)
+    RECIPES = ('all', 'rm_objs', 'rm_mods', 'rm_app', 'clean', 'cleanall', 'remake', 'build',
+               'configurations', 'ccache_stats')
+
+    # settings passed with command line options as they are (see generation_arguments)
+    OPTIONS = {
+               'encoding':            '--encoding',
+               'compiler':            '--compiler',
+               'object_extension':    '--obj-extension',
+               'dependency':          '--dependence',
+               'generator':           '--generator',
+               'module_directory':    '--module-dir',
+               'collector':           '--collector',
+               'compile_cache':       '--compile-cache',
+               'compile_cache_size':  '--compile-cache-size',
+               'build_directory':     '--build-dir',
+               'fragments_directory': '--fragments-dir',
+               'reachability':        '--reachability',
+               'fixed_line_length':   '--fixed-line-length',
+              }
+
+    # output backends: generator name -> (render method, default output file name)
+    GENERATORS = {
+                  'make':  ('render_makefile', 'Makefile'),
+                  'ninja': ('render_ninja',    'build.ninja'),
+                 }
+
+    def __init__(self, **kwargs):
+        '''
+        Arguments:
+            drop_execute_flag - make all source files not executable
+            verbose           - verbose process
+            debug             - print debug information
+            encoding          - encoding of source files
+            extensions        - the set of extensions
+            compiler          - compiler
+            appname           - application name
+            object_extension  - object files extension
+            dependency        - dependence mode (object files, modules)
+            makefile_name     - the name of makefile
+            pcompiler_params  - primary compiler parameters
+            scompiler_params  - secondary compiler parameters
+            ignore_paths      - the set of paths (or glob patterns) to be ignored
+            ignore_modules    - the set of available modules
+            ignore_includes   - the set of available include files
+            cache             - parse cache file name (relative to project directory), None
+                                disables caching (command line uses CACHE_FILE by default)
+            jobs              - number of worker processes for parsing (0 - use all cores)
+            timestamp         - put generation time into makefile header (makefile is
+                                rewritten on every run then)
+            module_directory  - directory for .mod files (next to makefile if None)
+            grouped_targets   - declare object and its .mod files as grouped targets (&:),
+                                requires GNU make 4.3+, if None is detected automatically
+            generator         - output backend (make, ninja), see GENERATORS
+            compile_cache     - directory of the compilation cache (objects and .mod files are
+                                restored instead of compiling when sources, included and used
+                                .mod files, compiler and flags are unchanged), None to disable
+            compile_cache_size - size limit of the compilation cache (e.g. 500M, 5G)
+            collector         - how source files are found: walk (directory tree) or git
+                                (git index and untracked files), see collect_files
+            module_stamps     - in modules dependence mode, keep .mod files untouched when
+                                their contents are the same and make dependents use stamp
+                                files updated only on interface changes (see modstamp module)
+            build_directory   - root of out-of-tree builds: objects, .mod files and executables
+                                of every configuration are placed into its subdirectory (next
+                                to the sources if None), see configuration_directory
+            configurations    - build configurations for build_directory, dictionary name ->
+                                compiler parameters ({'pcompiler_params': ...,
+                                'scompiler_params': ...}, missing ones are taken from the
+                                parser), the first one is the default (release if None)
+            preprocess        - evaluate preprocessor directives while scanning (#if, #ifdef,
+                                #define, #include) with macros defined by -D options of
+                                pcompiler_params, see preprocess_lines
+            fragments_directory - directory for makefile fragments (.d files) with rules of
+                                every object, makefile includes them and keeps variables and
+                                common targets only (make generator), see write_fragments
+            reachability      - collect call sites and find objects not reachable from the
+                                programs (see reachable_files): list them in the summary or
+                                prune them from the build (None, list, prune)
+            fixed_line_length - fixed form text after this column is ignored (72 by standard,
+                                e.g. 132 with -ffixed-line-length-132, -extend-source)
+        '''
+        check_arguments = set(kwargs) - set(ProjectParser.DEFAULTS)
+        if check_arguments:
+            raise KeyError(f'Unexpected argument(s): {list(check_arguments)}')
+
+        for key in ProjectParser.DEFAULTS:
+            if key in ('ignore_modules', 'ignore_includes'):
+                if key in kwargs:
+                    setattr(self, key, ProjectParser.DEFAULTS[key] + list(kwargs[key]))
+                    continue
+
+            setattr(self, key, kwargs.get(key, ProjectParser.DEFAULTS[key]))
+
+        if self.generator not in ProjectParser.GENERATORS:
+            raise ValueError(f'Unknown generator {self.generator}. '
+                             f'Expected one of {list(ProjectParser.GENERATORS)}')
+
+        if self.collector not in ('walk', 'git'):
+            raise ValueError(f'Unknown collector {self.collector}. Expected walk or git')
+
+        if self.reachability not in (None, 'list', 'prune'):
+            raise ValueError(f'Unknown reachability mode {self.reachability}. '
+                             f'Expected list or prune')
+
+        if self.fragments_directory and self.generator != 'make':
+            raise ValueError('Makefile fragments are supported by make generator only')
+
+        if self.build_directory is not None:
+            self.configurations = dict(self.configurations or {'release': {}})
+            for name in self.configurations:
+                if not re.fullmatch(r'\w[\w.-]*', name) or name in ProjectParser.RECIPES:
+                    raise ValueError(f'Invalid configuration name {name}')
+
+        if 'makefile_name' not in kwargs:
+            self.makefile_name = ProjectParser.GENERATORS[self.generator][1]
+
+        self.directory = '.'
+        self.modules, self.functions, self.subroutines = {}, {}, {}
+        self.programs, self.duplicates, self.includes = [], [], []
+        self.include_memo = {}
+        self.parse_cache = None
+        self.hooks = []
+        self.fragments = {}
+
+        appname = remove_extenstions(self.appname, ('.x', '.exe'))
+        if platform_ == 'Linux':
+            self.appname = appname + '.x'
+        elif platform_ == 'Windows':
+            self.appname = appname + '.exe'
+
+    def add_hook(self, hook):
+        '''
+        Register profiling <hook>. It is called for every finished piece of work (phase of
+        makefile generation, reading and scanning of every source and included file, output
+        writing) as hook(name, category, start, duration, args), where start is the value of
+        time.perf_counter(), duration is in seconds, args is a dictionary with details
+        (e.g. file, worker - process id of the parsing worker).
+        '''
+        self.hooks.append(hook)
+
+    def emit_span(self, name, category, start, duration, args=None):
+        '''
+        Pass finished piece of work to the hooks (see add_hook).
+        '''
+        for hook in self.hooks:
+            hook(name, category, start, duration, args or {})
+
+    @contextlib.contextmanager
+    def span(self, name, category='phase', **args):
+        '''
+        Measure the block of code for the hooks (see add_hook).
+        '''
+        if not self.hooks:
+            yield
+            return
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.emit_span(name, category, start, time.perf_counter()-start, args)
+
+    def register_contents(self, file, contains):
+        '''
+        Merge parse result of the <file> into the project maps. Duplicated modules and
+        program units are collected to be reported by parse_project.
+        '''
+        for key in ('modules', 'subroutines', 'functions'):
+            registry = getattr(self, key)
+            names = contains[key]
+            if key == 'modules':
+                names = names + [submodule['name'] for submodule in contains['submodules']]
+            for name in names:
+                if key == 'modules' and registry.get(name, file) != file:
+                    self.duplicates.append((name, registry[name], file))
+                registry[name] = file
+
+        self.includes.extend(contains['includes'])
+
+        if contains['entry_point']:
+            self.programs.append({'name': contains['entry_point'], 'location': file})
+
+    def scan_source_file(self, file, stamps=None):
+        '''
+        Read the source <file> and collect its contents (included files are scanned as well).
+        Has no side effects on the parser state (see scan_source_file function for <stamps>).
+        '''
+        spans = [] if self.hooks else None
+        contains = scan_source_file(file, stamps=stamps, memo=self.include_memo, spans=spans,
+                                    **self.scan_settings())
+        for span in spans or ():
+            self.emit_span(*span)
+        return contains
+
+    def parse_source_file(self, file):
+        '''
+        Scan the source <file> with the parser settings and register its modules, subroutines,
+        functions and program entry in the project maps.
+
+        Returns:
+            parse result (see scan_source_file function)
+        '''
+        contains = self.scan_source_file(file)
+        self.register_contents(file, contains)
+        return contains
+
+    def scan_settings(self):
+        '''
+        Get parser settings required by scan_source_file function.
+        '''
+        return {'debug':           self.debug,
+                'encoding':        self.encoding,
+                'ignore_modules':  self.ignore_modules,
+                'ignore_includes': self.ignore_includes,
+                'defines':         self.defines(),
+                'references':      self.reachability is not None,
+                'line_length':     self.fixed_line_length}
+
+    def defines(self):
+        '''
+        Get macros for evaluation of the preprocessor directives (None if it is disabled)
+        defined by primary and secondary compiler parameters of every configuration. Macros
+        which are not the same for all configurations are unknown (None values), so both
+        branches of the conditions using them are scanned (see is_unknown_macro).
+        '''
+        if not self.preprocess:
+            return None
+
+        params = [(self.pcompiler_params, self.scompiler_params)]
+        if self.build_directory is not None:
+            params = [self.configuration_params(name) for name in self.configurations]
+
+        variants = [preprocessor_definitions(f'{pparams} {sparams}') for pparams, sparams in params]
+        defines = {}
+        for variant in variants:
+            for name in variant:
+                values = set(other.get(name) for other in variants)
+                defines[name] = values.pop() if len(values) == 1 else None
+
+        return defines
+
+    def scan_files(self, files, hints=None):
+        '''
+        Scan the list of <files>. Uses a pool of <jobs> worker processes if allowed.
+
+        Arguments:
+            files - list of files
+            hints - dictionary file -> stamps known from the previous run
+
+        Returns:
+            list of (parse result, stamps, timings) in the order of <files>, timings are
+            collected only if profiling hooks are registered
+        '''
+        scan = functools.partial(scan_source_task, profile=bool(self.hooks),
+                                 **self.scan_settings())
+        tasks = [(file, (hints or {}).get(file, {})) for file in files]
+
+        jobs = self.jobs or os.cpu_count() or 1
+        if jobs < 2 or len(tasks) < 2:
+            return [scan(task, memo=self.include_memo) for task in tasks]
+
+        jobs = min(jobs, len(tasks))
+        with concurrent.futures.ProcessPoolExecutor(max_workers=jobs,
+                                                    initializer=init_scan_worker) as executor:
+            return list(executor.map(scan, tasks, chunksize=max(1, len(tasks)//(jobs*4))))
+
+    def parse_files(self, files):
+        '''
+        Get parse results for <files>: unchanged files are taken from the cache, the rest
+        are scanned (in parallel if allowed).
+
+        Returns:
+            dictionary file -> contents
+        '''
+        parsed = {}
+        if self.parse_cache:
+            with self.span('cache lookup'):
+                for file in files:
+                    contains = self.parse_cache.lookup(file)
+                    if contains is not None:
+                        parsed[file] = contains
+
+        pending = [file for file in files if file not in parsed]
+        hints = {file: self.parse_cache.hints(file) for file in pending} if self.parse_cache else {}
+        with self.span('scan', files=len(pending), jobs=self.jobs):
+            scanned = self.scan_files(pending, hints)
+
+        for file, (contains, stamps, spans) in zip(pending, scanned):
+            parsed[file] = contains
+            if self.parse_cache:
+                self.parse_cache.store(file, contains, stamps)
+            for span in spans or ():
+                self.emit_span(*span)
+
+        return parsed
+
+    def parse_project(self):
+        self.include_memo = {}
+        self.structure = self.parse_files(self.fileset)
+        with self.span('merge'):
+            self.merge_structure()
+
+    def update_project(self, paths=None):
+        '''
+        Bring the parsed project up to date after some files were changed (used by watch mode).
+        Only changed sources and sources including changed files are parsed again.
+
+        Arguments:
+            paths - changed, created or removed files, if None every file is checked and the
+                    project directory is collected again
+
+        Returns:
+            list of source files with changed parse result (including created and removed ones)
+        '''
+        previous = self.structure
+
+        if paths is None:
+            self.fileset = collect_files(self.directory, self.ignore_paths, self.extensions,
+                                         self.collector)
+            touched = set(self.fileset)
+        else:
+            paths = set(os.path.normpath(path) for path in paths)
+            created = [path for path in sorted(paths) if path not in previous and
+                       self.is_project_file(path) and os.path.isfile(path)]
+            self.fileset = [file for file in self.fileset
+                            if file not in paths or os.path.isfile(file)] + created
+            touched = set(file for file in self.fileset if file in paths or
+                          not paths.isdisjoint(previous.get(file, {}).get('includes', ())))
+
+        self.include_memo = {}
+        parsed = self.parse_files([file for file in self.fileset if file in touched])
+        self.structure = {file: parsed.get(file, previous.get(file)) for file in self.fileset}
+
+        if self.parse_cache:
+            self.parse_cache.save()
+
+        self.merge_structure()
+
+        return sorted(file for file in set(previous) | set(self.structure)
+                      if previous.get(file) != self.structure.get(file))
+
+    def is_project_file(self, path):
+        '''
+        Check whether <path> is a source file of the project (see collect_files).
+        '''
+        return (has_extension(path, self.extensions) and
+                not is_ignored(path, self.directory, self.ignore_paths))
+
+    def merge_structure(self):
+        '''
+        Build project maps (modules, subroutines, functions, includes, entry point)
+        from parse results of the source files and check their consistency.
+        '''
+        self.entry_point = None
+        self.empty_files = []
+
+        if self.debug:
+            print('========== PROJECT INFORMATION ==========\n')
+
+        self.modules, self.functions, self.subroutines = {}, {}, {}
+        self.programs, self.duplicates, self.includes = [], [], []
+
+        for file in self.fileset:
+
+            contains = self.structure[file]
+            self.register_contents(file, contains)
+
+            is_empty = not any([bool(item) for item in contains.items()])
+            if is_empty:
+                self.empty_files.append(file)
+
+            if self.debug:
+                width = max([len(key) for key in contains.keys()])
+                print('*** File [%s]' % file, end=' ')
+                if not is_empty:
+                    print('info:')
                     for key in contains:
-                        if key in ('entry_point', 'functions'):
+                        if key in ('entry_point', 'functions', 'calls'):
                             continue
                         if contains[key]:
-                            elems  = list(set(contains[key]))
+                            elems  = list(dict.fromkeys(map(str, contains[key])))
                             prefix = '>>> %s%s: [' % (key, ' '*(width-len(key)))
                             block = get_wrapped_line(elems, prefix, postfix=']', sep=', ', end='')
                             print(block)
@@ -553,7 +1825,15 @@ class ProjectParser:
                     print('!!! contains program entry.')
                 print()
 
-            self.structure[file] = contains
+        # the same file may be included by many sources
+        self.includes = list(dict.fromkeys(self.includes))
+
+        # modules having submodules provide their .smod files as well (see module_filename)
+        for file in self.fileset:
+            for submodule in self.structure[file]['submodules']:
+                ancestor = submodule['ancestor']
+                if ancestor in self.modules:
+                    self.modules[f'{ancestor}@'] = self.modules[ancestor]
 
         if self.empty_files:
             if self.debug:
@@ -565,48 +1845,296 @@ class ProjectParser:
                 print()
             raise FortranSyntaxError('Empty stream(s) found.')
 
-    def resolve_dependencies(self):
+        if self.duplicates:
+            print('\nModule(s) defined more than once:')
+            for module, first, second in self.duplicates:
+                print('>>', module, 'in', first, 'and', second)
+            print()
+            raise FortranSyntaxError('Found duplicated module(s).')
+
+        # every program gets its own executable (see executables)
+        locations = {}
+        for program in self.programs:
+            locations.setdefault(program['name'], []).append(program['location'])
+        duplicated = {name: files for name, files in locations.items() if len(files) > 1}
+        if duplicated:
+            print('\nProgram(s) defined more than once:')
+            for name, files in duplicated.items():
+                print('>>', name, 'in', ' and '.join(files))
+            print()
+            raise FortranSyntaxError('Found duplicated program(s).')
+
+        if self.programs:
+            self.entry_point = self.programs[0]
 
-        # remove self-dependencies
+        # objects not needed by the programs are listed or not built (see reachability)
+        self.unreachable = []
+        if self.reachability and self.programs:
+            reachable = self.reachable_files()
+            self.unreachable = [file for file in self.fileset if file not in reachable]
+
+    def reachable_files(self):
+        '''
+        Get source files required by the programs: starting from the program files, files
+        providing the used modules (with their submodules) and files defining called
+        subroutines and referenced functions are added. Procedures which are not called
+        directly are found by declarations (EXTERNAL, PROCEDURE, type-bound procedures) and
+        pointer assignments (see DECLARATION_PATTERN).
+
+        Returns:
+            set of source files
+        '''
+        # procedure -> files defining it, module -> files with its submodules
+        definitions, implementations = {}, {}
         for file in self.fileset:
-            for module in self.structure[file]['modules']:
-                if module in self.structure[file]['dependencies']:
-                    self.structure[file]['dependencies'].remove(module)
+            contains = self.structure[file]
+            for name in contains['subroutines'] + contains['functions']:
+                definitions.setdefault(name, []).append(file)
+            for submodule in contains['submodules']:
+                implementations.setdefault(submodule['ancestor'], []).append(file)
+
+        reachable, stack = set(), [program['location'] for program in self.programs]
+        while stack:
+            file = stack.pop()
+            if file in reachable:
+                continue
+            reachable.add(file)
 
-        objects, modules, unproc = [], [], self.fileset[:]
-        while True:
-            removed = 0
-            for file in unproc:
-                if all([(module in modules) if self.structure[file]['dependencies'] else True
-                        for module in self.structure[file]['dependencies']]):
-                    modules.extend(self.structure[file]['modules'])
-                    objects.append(file)
-                    unproc.remove(file)
-                    removed += 1
-
-            if not unproc:
-                break
+            contains = self.structure[file]
+            stack.extend(self.modules[dep] for dep in contains['dependencies']
+                         if dep in self.modules)
+            for module in contains['modules']:
+                stack.extend(implementations.get(module, ()))
+            for name in contains['calls']:
+                stack.extend(definitions.get(name, ()))
 
-            if not removed:
-                print('\nFiles with unresolved dependencies:')
-                for file in unproc:
-                    print('Name', file)
-                    print('Dependencies:')
-                    k = 0
-                    for dep in self.structure[file]['dependencies']:
-                        if dep not in modules:
-                            k += 1
-                            print('  %2d) %s' % (k, dep))
-                print()
-                msg = 'Cannot resolve dependencies. Probably cross-dependence or missing modules.'
-                raise FortranSyntaxError(msg)
+        return reachable
+
+    def resolve_dependencies(self):
+
+        files = self.fileset
+        if self.reachability == 'prune':
+            unreachable = set(self.unreachable)
+            files = [file for file in self.fileset if file not in unreachable]
+
+        # file providing the module -> files using it
+        edges, labels, missing = {file: [] for file in files}, {}, {}
+        for file in files:
+            for dep in self.used_modules(file):
+                provider = self.modules.get(dep)
+                if provider is None:
+                    missing.setdefault(file, []).append(dep)
+                elif (provider, file) not in labels:
+                    labels[provider, file] = dep
+                    edges[provider].append(file)
+
+        if missing:
+            print('\nFiles with missing modules:')
+            for file, deps in missing.items():
+                print('Name', file)
+                print('Dependencies:')
+                for k, dep in enumerate(deps):
+                    print('  %2d) %s' % (k+1, dep))
+            print()
+            unknown = sorted(set(dep for deps in missing.values() for dep in deps))
+            raise FortranSyntaxError(f'Cannot resolve dependencies. Missing module(s): {unknown}')
+
+        self.dependents = edges
+
+        objects, unresolved = topological_sort(files, edges)
+
+        if unresolved:
+            print('\nCyclic dependencies between modules:')
+            blocked = set(unresolved)
+            cycles = [component for component in strongly_connected_components(unresolved, edges)
+                      if len(component) > 1]
+            for k, component in enumerate(cycles):
+                cycle = find_cycle(component, edges)
+                for i, (provider, file) in enumerate(zip(cycle, cycle[1:])):
+                    prefix = '  %2d) ' % (k+1) if not i else ' '*6
+                    print(f'{prefix}{file} uses {labels[provider, file]} from {provider}')
+                blocked -= set(component)
+            if blocked:
+                print('\nFiles depending on the cycles:')
+                for file in unresolved:
+                    if file in blocked:
+                        print('Name', file)
+            print()
+            raise FortranSyntaxError('Cannot resolve dependencies. Found cyclic dependencies.')
+
+        modules = [module for file in objects for module in self.provided_modules(file)]
 
         return objects, modules
 
+####################################################################################################
+
+    def graph_report(self):
+        '''
+        Collect statistics of the dependency graph of the parsed project: depth of every
+        object, width of every level (available parallelism), the longest dependency chain
+        and modules with the largest transitive fan-in.
+
+        Returns:
+            dictionary (JSON serializable)
+        '''
+        objects, _ = self.resolve_dependencies()
+
+        # depth is the length of the longest chain of providers
+        depth, previous = dict.fromkeys(objects, 0), {}
+        for file in objects:
+            for user in self.dependents[file]:
+                if depth[file]+1 > depth[user]:
+                    depth[user], previous[user] = depth[file]+1, file
+
+        levels = [0]*(max(depth.values(), default=-1)+1)
+        for value in depth.values():
+            levels[value] += 1
+
+        path = []
+        if objects:
+            file = max(objects, key=lambda file: depth[file])
+            while file is not None:
+                path.append(file)
+                file = previous.get(file)
+            path.reverse()
+
+        # files affected by every file (bit masks over the topological order)
+        position, reach = {file: k for k, file in enumerate(objects)}, {}
+        for file in reversed(objects):
+            mask = 0
+            for user in self.dependents[file]:
+                mask |= reach[user] | (1 << position[user])
+            reach[file] = mask
+
+        fan_in = [{'module': module, 'file': file, 'dependents': bin(reach[file]).count('1')}
+                  for file in objects for module in self.structure[file]['modules']]
+        fan_in.sort(key=lambda item: (-item['dependents'], item['module']))
+
+        return {'objects':         len(objects),
+                'dependencies':    sum(len(users) for users in self.dependents.values()),
+                'depth':           depth,
+                'levels':          levels,
+                'max_parallelism': max(levels, default=0),
+                'critical_path':   [{'file': file, 'modules': self.structure[file]['modules']}
+                                    for file in path],
+                'fan_in':          fan_in}
+
+    def print_graph_report(self, report=None, top=10):
+        '''
+        Output dependency graph statistics (see graph_report).
+        '''
+        report = report or self.graph_report()
+
+        print('========== DEPENDENCY GRAPH ==========\n')
+        print('objects:             ', report['objects'])
+        print('dependencies:        ', report['dependencies'])
+        print('levels:              ', len(report['levels']))
+        print('level widths:        ', ' '.join(map(str, report['levels'])))
+        print('max parallelism:     ', report['max_parallelism'])
+
+        print(f'\nCritical path ({len(report["critical_path"])} object(s)):')
+        for k, item in enumerate(report['critical_path']):
+            modules = f' [{", ".join(item["modules"])}]' if item['modules'] else ''
+            print('  %2d) %s%s' % (k+1, item['file'], modules))
+
+        print(f'\nLargest transitive fan-in (top {top}):')
+        for k, item in enumerate(report['fan_in'][:top]):
+            print('  %2d) %s (%s): %d object(s)' % (k+1, item['module'], item['file'],
+                                                  item['dependents']))
+        print()
+
+    def impacted_by(self, files):
+        '''
+        Find what is to be rebuilt if the <files> (sources or included files, paths relative to
+        the project directory or absolute) are changed: sources which are or include them and
+        all users of their modules (transitively).
+
+        Returns:
+            dictionary (JSON serializable) with the changed files, ignored ones (neither sources
+            nor included files, e.g. removed files or documentation), affected objects (sources
+            in the build order), their modules and executables to be linked again, paths are
+            relative to the project directory
+        '''
+        objects, _ = self.resolve_dependencies()
+
+        # paths of the project files include the project directory
+        def relative(path):
+            return os.path.normpath(os.path.relpath(path, self.directory))
+
+        # included file -> sources including it (directly or by nested includes)
+        includers = {}
+        for file in self.fileset:
+            for include in self.structure[file]['includes']:
+                includers.setdefault(relative(include), []).append(file)
+        sources = {relative(file): file for file in self.fileset}
+
+        changed, ignored, stack = [], [], []
+        for path in files:
+            path = relative(path if os.path.isabs(path) else os.path.join(self.directory, path))
+            direct = ([sources[path]] if path in sources else []) + includers.get(path, [])
+            (changed if direct else ignored).append(path)
+            stack.extend(file for file in direct if file in self.dependents)
+
+        affected = set()
+        while stack:
+            file = stack.pop()
+            if file not in affected:
+                affected.add(file)
+                stack.extend(self.dependents[file])
+
+        objects = [file for file in objects if file in affected]
+        modules = [module for file in objects for module in self.structure[file]['modules']]
+
+        # every program is linked with the library of the multi-program project
+        executables = self.executables()
+        if len(executables) == 1 or affected.difference(executables.values()):
+            programs = list(executables) if objects else []
+        else:
+            programs = [name for name, program in executables.items() if program in affected]
+
+        return {'changed':  list(dict.fromkeys(changed)),
+                'ignored':  list(dict.fromkeys(ignored)),
+                'objects':  [relative(file) for file in objects],
+                'modules':  modules,
+                'programs': programs}
+
 ####################################################################################################
 
     def analize_project(self, directory):
-        raise NotImplementedError
+        '''
+        Collect and parse project at <directory> path. Nothing is printed or written except
+        the parse cache (see cache argument).
+
+        Returns:
+            dictionary source file -> contents (see scan_source_file)
+        '''
+        import datetime
+
+        self.generated = datetime.datetime.now()
+
+        self.directory = directory
+        with self.span('collect'):
+            self.fileset = collect_files(directory, self.ignore_paths, self.extensions,
+                                         self.collector)
+
+        if self.cache:
+            settings = {'encoding':        self.encoding,
+                        'ignore_modules':  sorted(self.ignore_modules),
+                        'ignore_includes': sorted(self.ignore_includes),
+                        'defines':         self.defines(),
+                        'references':      self.reachability is not None,
+                        'line_length':     self.fixed_line_length}
+            with self.span('cache load'):
+                self.parse_cache = ParseCache(Path(directory) / self.cache, settings)
+
+        with self.span('parse', files=len(self.fileset)):
+            self.parse_project()
+
+        if self.parse_cache:
+            with self.span('cache save'):
+                self.parse_cache.save()
+
+        return self.structure
 
 ####################################################################################################
 
@@ -614,102 +2142,885 @@ class ProjectParser:
         '''
         Generate makefile for project at <directory> path.
         '''
-        self.generated = datetime.datetime.now()
+        with self.span('create_makefile', directory=str(directory)):
+            self.analize_project(directory)
 
-        self.fileset = collect_files(directory, self.ignore_paths, self.extensions)
-        self.parse_project()
+            if self.verbose:
+                with self.span('report'):
+                    self.print_summary()
 
-        if self.verbose:
-            draw_directory_tree(self.fileset+self.includes)
-            print()
+            if self.drop_execute_flag:
+                if platform_ == 'Linux':
+                    import subprocess
+
+                    with self.span('chmod'):
+                        subprocess.call(['chmod', 'a-x'] + self.fileset)
+
+            self.write_makefile()
+
+    def print_summary(self):
+        '''
+        Print project tree and makefile settings.
+        '''
+        draw_directory_tree(self.fileset+self.includes)
+        print()
+        executables = self.executables()
+        if len(executables) > 1:
+            print('programs:            ', ' '.join(executables))
+            print('library:             ', self.library_name())
+        else:
             print('appname:             ', self.appname)
-            print('compiler:            ', self.compiler)
-            print('primary parameters:  ', self.pcompiler_params)
-            print('secondary parameters:', self.scompiler_params)
-            print('available recipes:   ', 'clean cleanall remake build rm_objs rm_mods rm_app')
+        print('compiler:            ', self.compiler)
+        print('primary parameters:  ', self.pcompiler_params)
+        print('secondary parameters:', self.scompiler_params)
+        if self.parse_cache:
+            print('parse cache:         ', f'{self.parse_cache.hits} hit(s),',
+                                           f'{self.parse_cache.misses} miss(es)')
+        if self.compile_cache:
+            print('compile cache:       ', self.compile_cache)
+        if self.build_directory is not None:
+            print('build directory:     ', self.build_directory)
+            print('configurations:      ', ' '.join(self.configurations))
+        if self.generator == 'make':
+            recipes = 'clean cleanall remake build rm_objs rm_mods rm_app'
+            if len(executables) > 1:
+                recipes = 'all ' + recipes
+            if self.build_directory is not None:
+                recipes += ' configurations ' + ' '.join(self.configurations)
+            print('available recipes:   ', recipes + (' ccache_stats' if self.compile_cache
+                                                      else ''))
+        else:
+            targets = 'all'
+            if self.build_directory is not None:
+                targets += ' ' + ' '.join(self.configurations)
+            print('available targets:   ', targets + ' (use ninja -t clean for cleaning)')
+
+        if self.unreachable:
+            state = 'not built' if self.reachability == 'prune' else 'built'
+            print(f'\nUnreachable from the program(s), {state}:')
+            for k, file in enumerate(self.unreachable):
+                print('  %2d) %s' % (k+1, file))
+
+    def write_makefile(self):
+        '''
+        Resolve dependencies of the parsed project and write makefile (if it has changed)
+        with the selected generator.
+
+        Returns:
+            True if makefile was written
+        '''
+        text = self.render()
+
+        if self.use_module_stamps():
+            self.create_module_stamps()
+
+        with self.span('write', file=self.makefile_name):
+            changed = write_if_changed(self.makefile_name, text)
+
+        if self.verbose:
+            print(f'{"created:" if changed else "up to date:":21s} {self.makefile_name}')
+
+        if self.fragments_directory:
+            with self.span('fragments', files=len(self.fragments)):
+                written = self.write_fragments()
+            if self.verbose:
+                print(f'{"fragments:":21s} {written} of {len(self.fragments)} written')
+
+        return changed
+
+    def fragment_file(self, file):
+        '''
+        Get the name of makefile fragment with rules of the source <file>.
+        '''
+        name = Path(os.path.relpath(file, self.directory)).as_posix()
+        return f'{Path(self.fragments_directory).as_posix()}/{name}.d'
+
+    def fragments_stamp(self):
+        '''
+        Get the name of the file updated with every makefile generation. It is included by
+        makefile and depends on all sources and included files, so make updates makefile and
+        fragments once when any of them is changed.
+        '''
+        return f'{Path(self.fragments_directory).as_posix()}/fragments.mk'
+
+    def generation_arguments(self, run=False):
+        '''
+        Get command line arguments (see __main__ module) generating the same makefile with the
+        parser settings (used by makefile to update itself, see fragments_directory). Settings
+        of the run only (parse cache, jobs) do not change makefile, so they are included if
+        <run> is set only (header stays the same when they are changed).
+
+        Returns:
+            list of arguments or None if the settings cannot be passed with command line
+            (project is not in the current directory, configuration has its own secondary
+            parameters)
+        '''
+        defaults = ProjectParser.DEFAULTS
+        if os.path.normpath(self.directory) != '.':
+            return None
+
+        arguments = []
+        for key, option in ProjectParser.OPTIONS.items():
+            value = getattr(self, key)
+            if value is not None and value != defaults[key]:
+                arguments += [option, str(value)]
+
+        appname = remove_extenstions(self.appname, ('.x', '.exe'))
+        if appname != defaults['appname']:
+            arguments += ['--appname', appname]
+        if self.makefile_name != ProjectParser.GENERATORS[self.generator][1]:
+            arguments += ['--makefile-name', self.makefile_name]
+        if self.extensions != defaults['extensions']:
+            arguments += ['--extensions', ';'.join(self.extensions)]
+        if self.ignore_paths:
+            arguments += ['--ignore-paths', ';'.join(self.ignore_paths)]
+
+        # default modules and included files are added by the parser
+        for key, option in (('ignore_modules', '--ignore-modules'),
+                            ('ignore_includes', '--ignore-includes')):
+            names = [name for name in getattr(self, key) if name not in defaults[key]]
+            if names:
+                arguments += [option, ';'.join(names)]
+
+        if run and self.cache is None:
+            arguments.append('--no-cache')
+        elif run and self.cache != ProjectParser.CACHE_FILE:
+            arguments += ['--cache', self.cache]
+        if run and self.jobs != defaults['jobs']:
+            arguments += ['--jobs', str(self.jobs)]
+        if self.grouped_targets is not None:
+            arguments += ['--grouped-targets', 'yes' if self.grouped_targets else 'no']
+        for key, option in (('timestamp', '--timestamp'), ('module_stamps', '--module-stamps')):
+            if getattr(self, key):
+                arguments.append(option)
+        if not self.preprocess:
+            arguments.append('--no-preprocess')
+
+        # configurations are passed with their primary parameters
+        params = (self.pcompiler_params, self.scompiler_params)
+        if self.build_directory is not None:
+            arguments += ['--config', '']
+            for name in self.configurations:
+                pparams, sparams = self.configuration_params(name)
+                if sparams != self.scompiler_params:
+                    return None
+                arguments += ['--add-config', f'{name}={pparams}']
+        elif params != (defaults['pcompiler_params'], defaults['scompiler_params']):
+            arguments += ['--config', '']
+
+        if params != (defaults['pcompiler_params'], defaults['scompiler_params']):
+            arguments += ['--pparams', self.pcompiler_params, '--sparams', self.scompiler_params]
+
+        return arguments
+
+    def generation_header(self):
+        '''
+        Get header comment lines with the command line generating the output (see
+        generation_arguments).
+        '''
+        arguments = self.generation_arguments()
+        if arguments is None:
+            return '# generated automatically with python interface\n'
+
+        import shlex
+
+        command = ' '.join(['python -m fmakefile'] + [shlex.quote(arg) for arg in arguments])
+        return f'# generated automatically with command line:\n# {command}\n'
+
+    def write_fragments(self):
+        '''
+        Write makefile fragments rendered with makefile (see fragments_directory). Only the
+        changed fragments are written (hashes of the written ones are kept in the index file),
+        fragments of removed sources are deleted. Fragments stamp is touched, so make does not
+        try to update them again (see fragments_stamp).
+
+        Returns:
+            number of written fragments
+        '''
+        index_file = os.path.join(self.fragments_directory, 'index.json')
+        try:
+            with open(index_file, encoding='utf-8') as stream:
+                index = json.load(stream)
+        except (OSError, ValueError):
+            index = {}
+
+        written, hashes = 0, {}
+        for path, text in self.fragments.items():
+            hashes[path] = hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+            if index.get(path) != hashes[path] or not os.path.isfile(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                if write_if_changed(path, text):
+                    written += 1
+
+        for path in set(index) - set(hashes):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+        os.makedirs(self.fragments_directory, exist_ok=True)
+        write_if_changed(index_file, json.dumps(hashes, indent=0, sort_keys=True))
+
+        stamp = self.fragments_stamp()
+        if not write_if_changed(stamp, '# updated with every makefile generation\n'):
+            os.utime(stamp)
+
+        return written
+
+    def render(self, objects=None, modules=None):
+        '''
+        Get makefile contents (or build file of the selected generator) for ordered <objects>
+        and <modules>, dependencies of the parsed project are resolved if they are not given.
+        '''
+        if objects is None:
+            with self.span('resolve'):
+                objects, modules = self.resolve_dependencies()
+
+        with self.span('render', generator=self.generator):
+            render = getattr(self, ProjectParser.GENERATORS[self.generator][0])
+            return render(objects, modules)
+
+    def provided_modules(self, file):
+        '''
+        Get modules and submodules (see module_filename) produced by compilation of the <file>.
+        '''
+        contains = self.structure[file]
+        provided = []
+        for module in contains['modules']:
+            provided.append(module)
+            if f'{module}@' in self.modules:
+                provided.append(f'{module}@')
+        return provided + [submodule['name'] for submodule in contains['submodules']]
+
+    def used_modules(self, file):
+        '''
+        Get modules used by the <file> except the ones provided by the file itself (including
+        submodules of its modules). Parse results are not changed, so they can be compared
+        with the ones of the next parsing (see update_project).
+        '''
+        return [dep for dep in self.structure[file]['dependencies']
+                if self.modules.get(dep) != file]
+
+    def executables(self):
+        '''
+        Get executables of the project as dictionary name -> program source file (None if
+        project has no program). Project with one program is linked into the application,
+        otherwise every program gets executable named after it, which is linked with the
+        library of the other objects (see library_name).
+        '''
+        if len(self.programs) < 2:
+            return {self.appname: self.entry_point['location'] if self.entry_point else None}
+
+        extension = os.path.splitext(self.appname)[1]
+        return {program['name'] + extension: program['location'] for program in self.programs}
+
+    def library_name(self):
+        '''
+        Get the name of static library with common objects of the multi-program project.
+        '''
+        name = os.path.splitext(self.appname)[0]
+        return f'{name}.lib' if platform_ == 'Windows' else f'lib{name}.a'
+
+    def library_objects(self, objects):
+        '''
+        Get the sources of <objects> which are not programs (library of the multi-program
+        project).
+        '''
+        programs = set(program['location'] for program in self.programs)
+        return [obj for obj in objects if obj not in programs]
+
+    def archiver(self):
+        '''
+        Get archiver call creating the static library (name of the library is appended).
+        '''
+        preset = PRESETS.get(self.compiler, PRESETS['ifort'])
+        return preset.get(platform_, preset['Linux'])['archiver']
+
+    def configuration_params(self, name):
+        '''
+        Get (primary, secondary) compiler parameters of the configuration <name>.
+        '''
+        params = self.configurations[name]
+        return (params.get('pcompiler_params', self.pcompiler_params),
+                params.get('scompiler_params', self.scompiler_params))
+
+    def configuration_directory(self, name):
+        '''
+        Get build directory of the configuration <name> (None if objects are placed next to
+        the sources).
+        '''
+        if self.build_directory is None:
+            return None
+        return f'{Path(self.build_directory).as_posix()}/{name}'
+
+    def build_path(self, name, directory=None):
+        '''
+        Get path of the build product <name> (executable, library) in the build <directory>.
+        '''
+        return f'{directory}/{name}' if directory else name
+
+    def module_path(self, directory=None):
+        '''
+        Get directory for .mod files of the build <directory> (None if they are placed next to
+        makefile).
+        '''
+        if directory is None:
+            return self.module_directory
+        return f'{directory}/{self.module_directory}' if self.module_directory else directory
+
+    def object_file(self, file, directory=None):
+        '''
+        Get object file name for the source <file>. In the build <directory> it keeps the path
+        relative to the project directory (object is placed next to the source if None).
+        '''
+        obj = replace_extension(file, self.extensions, self.object_extension)
+        if directory is None:
+            return obj
+        return f'{directory}/{Path(os.path.relpath(obj, self.directory)).as_posix()}'
+
+    def module_file(self, module):
+        '''
+        Get the name of .mod (or .smod) file for the <module> (as it is used in makefile).
+        '''
+        name = module_filename(module)
+        if self.module_directory or self.build_directory is not None:
+            return f'$(MODDIR)/{name}'
+        return name
+
+    def module_flag(self):
+        '''
+        Get compiler option setting the directory for .mod files.
+        '''
+        preset = PRESETS.get(self.compiler, PRESETS['ifort'])
+        return preset.get(platform_, preset['Linux'])['modflag']
+
+    def use_module_stamps(self):
+        '''
+        Check whether dependents are keyed on module stamp files (see modstamp module).
+        '''
+        return self.module_stamps and self.dependency == 'modules'
+
+    def create_module_stamps(self):
+        '''
+        Create missing stamps of the already built modules (see modstamp module), so enabling
+        stamps does not cause rebuilding.
+        '''
+        from .modstamp import create_missing_stamps
+
+        directories = [self.module_directory]
+        if self.build_directory is not None:
+            directories = [self.module_path(self.configuration_directory(name))
+                           for name in self.configurations]
+
+        create_missing_stamps([str(Path(directory or '.') / module_filename(module))
+                               for directory in directories
+                               for file in self.fileset
+                               for module in self.provided_modules(file)])
+
+    def module_stamps_arguments(self, obj, module_file):
+        '''
+        Get stamps wrapper arguments for compilation of the source <obj> (or empty list if
+        it produces no modules).
+        '''
+        provided = [module_file(module) for module in self.provided_modules(obj)]
+        if not provided:
+            return []
+        return [f'--module {module}' for module in provided] + ['--']
+
+    def compile_cache_command(self):
+        '''
+        Get call of the compilation cache wrapper (see ccache module).
+        '''
+        return (f'{sys.executable} -m fmakefile.ccache --dir {self.compile_cache} '
+                f'--max-size {self.compile_cache_size}')
+
+    def compile_cache_arguments(self, obj, ostring, module_file):
+        '''
+        Get wrapper arguments for compilation of the source <obj>: produced object and .mod
+        files, files the compilation result depends on (source, included and used .mod files).
+
+        Arguments:
+            obj         - source file
+            ostring     - object file
+            module_file - function getting .mod file name for the module
+        '''
+        outputs = [ostring]
+        outputs += [module_file(module) for module in self.provided_modules(obj)]
+
+        inputs = [obj] + self.structure[obj]['includes']
+        inputs += [module_file(dep) for dep in self.used_modules(obj)]
+
+        return ([f'--output {output}' for output in outputs] +
+                [f'--input {input_}' for input_ in inputs] + ['--'])
+
+    def render_rules(self, obj, ostring, directory, grouped, flags):
+        '''
+        Get makefile rules compiling the source <obj> into the object <ostring>.
+
+        Arguments:
+            obj       - source file
+            ostring   - object file
+            directory - build directory (as it is used in makefile) or None
+            grouped   - declare object and .mod files as grouped targets
+            flags     - compiler flags
+
+        Returns:
+            list of makefile lines
+        '''
+        stamps = self.use_module_stamps()
+        moddir = self.module_path(directory)
+
+        rules = []
+
+        if self.dependency == 'object files':
+            deps = list(dict.fromkeys(self.object_file(self.modules[dep], directory)
+                                      for dep in self.used_modules(obj)))
+        else:
+            deps = [self.module_file(dep) + ('.stamp' if stamps else '')
+                    for dep in self.used_modules(obj)]
+
+        deps += self.structure[obj]['includes']
+
+        deps.append(obj)
+
+        # directories are only to exist, their timestamps do not matter
+        if self.build_directory is not None:
+            deps += ['|'] + list(dict.fromkeys([os.path.dirname(ostring), moddir]))
+        elif self.module_directory:
+            deps += ['|', '$(MODDIR)']
+
+        # dependance string
+        dstring = ' '.join(map(str, deps))
+
+        # .mod files are produced by the same compiler call as the object
+        provided = []
+        if self.dependency == 'modules':
+            provided = [self.module_file(module) for module in self.provided_modules(obj)]
+
+        if provided and grouped:
+            rules.append(f'{ostring} {" ".join(provided)} &: {dstring}\n')
+        else:
+            rules.append(f'{ostring}: {dstring}\n')
+
+        wrappers = []
+        if stamps and provided:
+            wrappers += ['$(FCSTAMP)'] + self.module_stamps_arguments(obj, self.module_file)
+        if self.compile_cache:
+            wrappers += ['$(FCCACHE)'] + self.compile_cache_arguments(obj, ostring, self.module_file)
 
-        if self.drop_execute_flag:
-            if platform_ == 'Linux':
-                subprocess.call(['chmod', 'a-x'] + self.fileset)
+        if wrappers:
+            command = ' '.join(wrappers + [f'$(COM) -c {flags} {obj} -o {ostring}'])
+            rules.append(get_wrapped_line(command.split(' '), prefix='\t') + '\n')
+        else:
+            rules.append(f'\t$(COM) -c {flags} {obj} -o {ostring}\n')
+
+        # stamps are touched by the compiler wrapper only when interface changes
+        if stamps:
+            provided += [f'{module}.stamp' for module in provided]
+
+        if provided and not grouped:
+            rules.append(f'{" ".join(provided)}: {ostring} ;\n')
+
+        return rules
 
-        objects, modules = self.resolve_dependencies()
+    def render_makefile(self, objects, modules):
+        '''
+        Get makefile contents for ordered <objects> (source files) and <modules>. With build
+        directory, objects of the configuration selected by CONFIG variable are placed into
+        its directory (see configuration_directory), every configuration has its own target.
+        Rules of the objects are put into <fragments> if fragments directory is set.
+        '''
+        build = self.build_directory is not None
+        directory = '$(BUILDDIR)' if build else None
+        moddir = self.module_path(directory)
 
-        objs = [replace_extension(obj, self.extensions, self.object_extension) for obj in objects]
-        mods = [module + '.mod' for module in modules]
+        objs = [self.object_file(obj, directory) for obj in objects]
+        mods = [self.module_file(module) for module in modules]
+
+        stamps = self.use_module_stamps()
+        if stamps:
+            mods += [f'{module}.stamp' for module in mods]
 
         obj_string = get_wrapped_line(objs, prefix='OBJS = ')
         mod_string = get_wrapped_line(mods, prefix='MODS = ')
 
-        mkfile = open(self.makefile_name, 'w')
+        # programs are linked with the library of the other objects
+        executables = self.executables()
+        multiple = len(executables) > 1
+        if multiple:
+            libobjs = [self.object_file(obj, directory) for obj in self.library_objects(objects)]
+            lib_string = get_wrapped_line(libobjs, prefix='LIBOBJS = ')
+            executables = {self.build_path(name, directory): program
+                           for name, program in executables.items()}
+            prog_string = get_wrapped_line(list(executables), prefix='PROGS = ')
+
+        # stamps rely on make checking modification times of targets with empty recipes
+        grouped = False
+        if self.dependency == 'modules' and not stamps:
+            grouped = self.grouped_targets
+            if grouped is None:
+                grouped = platform_ != 'Windows' and make_supports_grouped_targets()
+
+        mkfile = []
+
+        mkfile.append(f'\n# {"()"*25} #\n')
+        if self.timestamp:
+            mkfile.append(f'# {self.generated.strftime("%Y-%m-%d %H:%M")}\n')
+        mkfile.append(self.generation_header())
+        mkfile.append(f'# paltform: {platform_}\n')
+        mkfile.append(f'# {"()"*25} #\n\n')
+
+        if build:
+            mkfile.append(f'CONFIG={next(iter(self.configurations))}\n')
+            mkfile.append(f'CONFIGS={" ".join(self.configurations)}\n')
+            mkfile.append(f'BUILDDIR={self.configuration_directory("$(CONFIG)")}\n')
+        if multiple:
+            mkfile.append(f'LIB={self.build_path(self.library_name(), directory)}\n')
+        else:
+            mkfile.append(f'NAME={self.build_path(self.appname, directory)}\n')
+        mkfile.append(f'COM={self.compiler}\n')
+        if build:
+            for name in self.configurations:
+                pparams, sparams = self.configuration_params(name)
+                mkfile.append(f'PFLAGS_{name}={pparams}\n')
+                mkfile.append(f'SFLAGS_{name}={sparams}\n')
+            mkfile.append('PFLAGS=$(PFLAGS_$(CONFIG))\n')
+            mkfile.append('SFLAGS=$(SFLAGS_$(CONFIG))\n')
+        else:
+            mkfile.append(f'PFLAGS={self.pcompiler_params}\n')
+            mkfile.append(f'SFLAGS={self.scompiler_params}\n')
+        if moddir:
+            mkfile.append(f'MODDIR={moddir}\n')
+            mkfile.append(f'MODFLAGS={self.module_flag()}$(MODDIR)\n')
+        if self.compile_cache:
+            mkfile.append(f'FCCACHE={self.compile_cache_command()}\n')
+        if stamps:
+            mkfile.append(f'FCSTAMP={sys.executable} -m fmakefile.modstamp\n')
+        if multiple:
+            mkfile.append(f'ARCHIVE={self.archiver()}$(LIB)\n')
+        arguments = self.generation_arguments(run=True) if self.fragments_directory else None
+        if arguments is not None:
+            import shlex
+
+            arguments = ' '.join(map(shlex.quote, arguments)).replace('$', '$$')
+            mkfile.append(f'FMAKEFILE={sys.executable} -m fmakefile {arguments}\n')
+        mkfile.append('\n')
+
+        if build:
+            mkfile.append('ifeq ($(filter $(CONFIG),$(CONFIGS)),)\n')
+            mkfile.append('$(error Unknown configuration $(CONFIG), expected one of: $(CONFIGS))\n')
+            mkfile.append('endif\n\n')
+
+        if multiple:
+            mkfile.append(prog_string + '\n\n')
+        mkfile.append(obj_string + '\n\n')
+        if multiple:
+            mkfile.append(lib_string + '\n\n')
+        mkfile.append(mod_string + '\n\n')
+
+        if multiple:
+            mkfile.append('all: $(PROGS)\n\n')
+            mkfile.append('$(LIB): $(LIBOBJS)\n')
+            mkfile.append('\trm -f $(LIB)\n')
+            mkfile.append('\t$(ARCHIVE) $(LIBOBJS)\n\n')
+            for name, program in executables.items():
+                pstring = self.object_file(program, directory)
+                mkfile.append(f'{name}: {pstring} $(LIB)\n')
+                mkfile.append(f'\t$(COM) {pstring} $(LIB) $(SFLAGS) -o {name}\n\n')
+        else:
+            mkfile.append('$(NAME): $(OBJS)\n')
+            mkfile.append('\t$(COM) $(OBJS) $(SFLAGS) -o $(NAME)\n\n')
+
+        # build directories are created for the object subdirectories
+        if build:
+            for path in dict.fromkeys([moddir] + [os.path.dirname(obj) for obj in objs]):
+                mkfile.append(f'{path}:\n')
+                mkfile.append('\tmkdir -p $@\n\n')
+        elif self.module_directory:
+            mkfile.append('$(MODDIR):\n')
+            mkfile.append('\tmkdir -p $(MODDIR)\n\n')
+
+        flags = '$(PFLAGS) $(SFLAGS)' + (' $(MODFLAGS)' if moddir else '')
+
+        # rules of the objects are either inline or in the fragments included by makefile
+        self.fragments = {}
+        if self.fragments_directory:
+            deps = [self.fragment_file(obj) for obj in objects]
+            mkfile.append(get_wrapped_line(deps, prefix='DEPS = ') + '\n\n')
+
+            # the only target updating fragments, so generation is run once (see -j as well)
+            if arguments is not None:
+                sources = list(dict.fromkeys(objects + [include for obj in objects for include
+                                                        in self.structure[obj]['includes']]))
+                mkfile.append(get_wrapped_line(sources, prefix='FRAGSRCS = ') + '\n\n')
+                mkfile.append(f'{self.fragments_stamp()}: $(FRAGSRCS)\n')
+                mkfile.append('\t$(FMAKEFILE) --update-fragments\n\n')
+                mkfile.append('# removed files do not stop the update\n')
+                mkfile.append('$(FRAGSRCS):\n\n')
+                mkfile.append(f'-include {self.fragments_stamp()}\n')
+            mkfile.append('-include $(DEPS)\n')
+
+        for obj, ostring in zip(objects, objs):
+            rules = self.render_rules(obj, ostring, directory, grouped, flags)
+            if self.fragments_directory:
+                self.fragments[self.fragment_file(obj)] = ''.join(rules)
+            else:
+                mkfile.extend(rules)
 
-        mkfile.write(f'\n# {"()"*25} #\n')
-        mkfile.write(f'# {self.generated.strftime("%Y-%m-%d %H:%M")}\n')
-        mkfile.write(f'# generated automatically with command line:\n')
-        mkfile.write(f'# {Path(sys.argv[0]).name} {" ".join(sys.argv[1:])}\n')
-        mkfile.write(f'# paltform: {platform_}\n')
-        mkfile.write(f'# {"()"*25} #\n\n')
+        phony = 'rm_objs rm_mods rm_app clean cleanall remake build'
+        if multiple:
+            phony = 'all ' + phony
+        if build:
+            phony += f' configurations {" ".join(self.configurations)}'
+        if self.compile_cache:
+            phony += ' ccache_stats'
+        mkfile.append(f'\n.PHONY: {phony}\n')
 
-        mkfile.write(f'NAME={self.appname}\n')
-        mkfile.write(f'COM={self.compiler}\n')
-        mkfile.write(f'PFLAGS={self.pcompiler_params}\n')
-        mkfile.write(f'SFLAGS={self.scompiler_params}\n\n')
+        # recipes
+        mkfile.append('\nrm_objs:\n')
+        mkfile.append('\trm -f $(OBJS)\n\n')
 
-        mkfile.write(obj_string + '\n\n')
-        mkfile.write(mod_string + '\n\n')
-        mkfile.write('$(NAME): $(OBJS)\n')
-        mkfile.write('\t$(COM) $(OBJS) $(SFLAGS) -o $(NAME)\n\n')
+        mkfile.append('rm_mods:\n')
+        mkfile.append('\trm -f $(MODS)\n\n')
 
-        for obj in objects:
+        mkfile.append('rm_app:\n')
+        mkfile.append('\trm -f $(PROGS) $(LIB)\n\n' if multiple else '\trm -f $(NAME)\n\n')
 
-            if self.dependency == 'object files':
-                deps = [replace_extension(self.modules[dep], self.extensions, self.object_extension)
-                        for dep in self.structure[obj]['dependencies']]
-            else:
-                deps = [dep + '.mod' for dep in self.structure[obj]['dependencies']]
+        mkfile.append('clean:\n')
+        mkfile.append('\t$(MAKE) rm_objs\n')
+        mkfile.append('\t$(MAKE) rm_mods\n\n')
 
-            deps += self.structure[obj]['includes']
+        mkfile.append('cleanall:\n')
+        mkfile.append('\t$(MAKE) clean\n')
+        mkfile.append('\t$(MAKE) rm_app\n\n')
 
-            deps.append(obj)
+        mkfile.append('remake:\n')
+        mkfile.append('\t$(MAKE) cleanall\n')
+        mkfile.append('\t$(MAKE)\n\n')
 
-            # dependance string
-            dstring = ' '.join(map(str, deps))
+        mkfile.append('build:\n')
+        mkfile.append('\t$(MAKE) cleanall\n')
+        mkfile.append('\t$(MAKE)\n')
+        mkfile.append('\t$(MAKE) clean\n\n')
 
-            # object string
-            ostring = replace_extension(obj, self.extensions, self.object_extension)
+        # every configuration is built in its own directory
+        if build:
+            mkfile.append('configurations:\n')
+            for name in self.configurations:
+                mkfile.append(f'\t$(MAKE) CONFIG={name}\n')
+            mkfile.append('\n')
+            for name in self.configurations:
+                mkfile.append(f'{name}:\n')
+                mkfile.append(f'\t$(MAKE) CONFIG={name}\n\n')
 
-            mkfile.write(f'{ostring}: {dstring}\n')
-            mkfile.write(f'\t$(COM) -c $(PFLAGS) $(SFLAGS) {obj} -o {ostring}\n')
+        if self.compile_cache:
+            mkfile.append('ccache_stats:\n')
+            mkfile.append('\t$(FCCACHE) --stats\n\n')
 
-        mkfile.write('\n.PHONY: rm_objs rm_mods rm_app clean cleanall remake build\n')
+        return ''.join(mkfile)
 
-        # recipes
-        mkfile.write('\nrm_objs:\n')
-        mkfile.write('\trm -f $(OBJS)\n\n')
+    def render_ninja(self, objects, modules):
+        '''
+        Get ninja build file contents for ordered <objects> (source files) and <modules>.
+        Module files are implicit outputs of the object compilation; restat lets ninja skip
+        dependents when compiler keeps unchanged .mod files untouched. With build directory,
+        build statements are written for every configuration (see configuration_directory).
+        '''
+        build = self.build_directory is not None
+        stamps = self.use_module_stamps()
+        executables = self.executables()
+        multiple = len(executables) > 1
 
-        mkfile.write('rm_mods:\n')
-        mkfile.write('\trm -f $(MODS)\n\n')
+        ninja = []
 
-        mkfile.write('rm_app:\n')
-        mkfile.write('\trm -f $(NAME)\n\n')
+        ninja.append(f'\n# {"()"*25} #\n')
+        if self.timestamp:
+            ninja.append(f'# {self.generated.strftime("%Y-%m-%d %H:%M")}\n')
+        ninja.append(self.generation_header())
+        ninja.append(f'# paltform: {platform_}\n')
+        ninja.append(f'# {"()"*25} #\n\n')
 
-        mkfile.write('clean:\n')
-        mkfile.write('\t$(MAKE) rm_objs\n')
-        mkfile.write('\t$(MAKE) rm_mods\n\n')
+        ninja.append('ninja_required_version = 1.7\n\n')
 
-        mkfile.write('cleanall:\n')
-        mkfile.write('\t$(MAKE) clean\n')
-        mkfile.write('\t$(MAKE) rm_app\n\n')
+        if not build:
+            if multiple:
+                ninja.append(f'lib = {ninja_escape(self.library_name())}\n')
+            else:
+                ninja.append(f'name = {ninja_escape(self.appname)}\n')
+        ninja.append(f'com = {self.compiler}\n')
+        if build:
+            for name in self.configurations:
+                pparams, sparams = self.configuration_params(name)
+                ninja.append(f'pflags_{name} = {pparams}\n')
+                ninja.append(f'sflags_{name} = {sparams}\n')
+        else:
+            ninja.append(f'pflags = {self.pcompiler_params}\n')
+            ninja.append(f'sflags = {self.scompiler_params}\n')
+        if self.module_directory and not build:
+            ninja.append(f'modflags = {self.module_flag()}{ninja_escape(self.module_directory)}\n')
+        if self.compile_cache:
+            ninja.append(f'fccache = {self.compile_cache_command().replace("$", "$$")}\n')
+        if stamps:
+            ninja.append(f'fcstamp = {sys.executable.replace("$", "$$")} -m fmakefile.modstamp\n')
+        ninja.append('\n')
+
+        wrappers = ('$modstamp ' if stamps else '') + ('$ccache ' if self.compile_cache else '')
+
+        ninja.append('rule fc\n')
+        ninja.append(f'  command = {wrappers}$com -c $pflags $sflags $modflags $in -o $out\n')
+        ninja.append('  description = FC $in\n')
+        ninja.append('  restat = 1\n\n')
+
+        ninja.append('rule link\n')
+        ninja.append('  command = $com $in $sflags -o $out\n')
+        ninja.append('  description = LINK $out\n\n')
+
+        if multiple:
+            # archiver updates members of the existing library, so it is created again
+            remove = 'rm -f $out && ' if platform_ != 'Windows' else ''
+            ninja.append('rule ar\n')
+            ninja.append(f'  command = {remove}{self.archiver()}$out $in\n')
+            ninja.append('  description = AR $out\n\n')
+
+        configurations = list(self.configurations) if build else [None]
+        for configuration in configurations:
+
+            directory = self.configuration_directory(configuration) if build else None
+            moddir = self.module_path(directory)
+
+            def module_file(module):
+                return str(Path(moddir or '.') / module_filename(module))
+
+            # per configuration flags are set for every build statement
+            variables = ''
+            if build:
+                variables = (f'  pflags = $pflags_{configuration}\n'
+                             f'  sflags = $sflags_{configuration}\n'
+                             f'  modflags = {self.module_flag()}{ninja_escape(moddir)}\n')
+
+            objs = [self.object_file(obj, directory) for obj in objects]
+
+            for obj, ostring in zip(objects, objs):
+
+                if self.dependency == 'object files':
+                    deps = list(dict.fromkeys(self.object_file(self.modules[dep], directory)
+                                              for dep in self.used_modules(obj)))
+                else:
+                    deps = [module_file(dep) + ('.stamp' if stamps else '')
+                            for dep in self.used_modules(obj)]
+
+                deps += self.structure[obj]['includes']
+
+                provided = [module_file(module) for module in self.provided_modules(obj)]
+                if stamps:
+                    provided += [f'{module}.stamp' for module in provided]
+
+                outputs = ninja_escape(ostring)
+                if provided:
+                    outputs += ' | ' + ' '.join(map(ninja_escape, provided))
+
+                inputs = ninja_escape(obj)
+                if deps:
+                    inputs += ' | ' + ' '.join(map(ninja_escape, deps))
+
+                ninja.append(f'build {outputs}: fc {inputs}\n')
+                ninja.append(variables)
+                if stamps and provided:
+                    arguments = self.module_stamps_arguments(obj, module_file)
+                    arguments = ' '.join(arguments).replace('$', '$$')
+                    ninja.append(f'  modstamp = $fcstamp {arguments}\n')
+                if self.compile_cache:
+                    arguments = self.compile_cache_arguments(obj, ostring, module_file)
+                    ninja.append(f'  ccache = $fccache {" ".join(arguments).replace("$", "$$")}\n')
+
+            ninja.append('\n')
+            link_variables = f'  sflags = $sflags_{configuration}\n' if build else ''
+            if multiple:
+                lib = (ninja_escape(self.build_path(self.library_name(), directory)) if build
+                       else '$lib')
+                libobjs = [self.object_file(obj, directory)
+                           for obj in self.library_objects(objects)]
+                ninja.append(get_wrapped_line([ninja_escape(obj) for obj in libobjs],
+                                              prefix=f'build {lib}: ar ', end='$') + '\n\n')
+                for name, program in executables.items():
+                    pstring = self.object_file(program, directory)
+                    name = self.build_path(name, directory)
+                    ninja.append(f'build {ninja_escape(name)}: link {ninja_escape(pstring)} '
+                                 f'{lib}\n' + link_variables)
+                ninja.append('\n')
+                targets = [ninja_escape(self.build_path(name, directory))
+                           for name in executables]
+            else:
+                name = ninja_escape(self.build_path(self.appname, directory)) if build else '$name'
+                ninja.append(get_wrapped_line([ninja_escape(obj) for obj in objs],
+                                              prefix=f'build {name}: link ', end='$') + '\n')
+                ninja.append(link_variables + '\n')
+                targets = [name]
+
+            if build:
+                ninja.append(get_wrapped_line(targets, prefix=f'build {configuration}: phony ',
+                                              end='$') + '\n\n')
+            else:
+                ninja.append(get_wrapped_line(targets, prefix='build all: phony ',
+                                              end='$') + '\n\n')
 
-        mkfile.write('remake:\n')
-        mkfile.write('\t$(MAKE) cleanall\n')
-        mkfile.write('\t$(MAKE)\n\n')
+        if build:
+            ninja.append(f'build all: phony {" ".join(self.configurations)}\n\n')
+            ninja.append(f'default {next(iter(self.configurations))}\n')
+        else:
+            ninja.append('default all\n')
 
-        mkfile.write('build:\n')
-        mkfile.write('\t$(MAKE) cleanall\n')
-        mkfile.write('\t$(MAKE)\n')
-        mkfile.write('\t$(MAKE) clean\n\n')
+        return ''.join(ninja)
 
-        mkfile.close()
+####################################################################################################
 
-        if self.verbose:
-            print(f'{"creaeted:":21s} {self.makefile_name}')
+def generate(directory='.', **kwargs):
+    '''
+    Get makefile for the project at <directory> path without printing anything or writing
+    files (parse cache is written only if cache file name is given). Paths of the source files
+    include <directory>, so makefile is to be placed into the current directory.
+
+    Arguments:
+        directory - project directory
+        kwargs    - ProjectParser arguments (verbose and drop_execute_flag are off by default)
+
+    Returns:
+        dictionary:
+            makefile    - makefile (or build file of the selected generator) contents
+            objects     - source files in the build order
+            modules     - modules in the build order
+            structure   - contents of every source file (see scan_source_file)
+            dependents  - source file -> source files using its modules
+            includes    - included files
+            executables - executable name -> program source file (see executables)
+            fragments   - makefile fragment -> contents (see fragments_directory)
+            unreachable - source files not required by the programs (see reachability)
+
+    Raises:
+        FortranSyntaxError with the full report (missing modules, cycles, etc.)
+    '''
+    kwargs.setdefault('verbose', False)
+    kwargs.setdefault('drop_execute_flag', False)
+    fparser = ProjectParser(**kwargs)
+
+    # problems are reported by the parser with print
+    report = io.StringIO()
+    try:
+        with contextlib.redirect_stdout(report):
+            fparser.analize_project(directory)
+            objects, modules = fparser.resolve_dependencies()
+            text = fparser.render(objects, modules)
+    except FortranSyntaxError as error:
+        details = report.getvalue().strip()
+        raise FortranSyntaxError(f'{error}\n{details}' if details else str(error)) from None
+
+    return {'makefile':    text,
+            'objects':     objects,
+            'modules':     modules,
+            'structure':   fparser.structure,
+            'dependents':  {file: list(users) for file, users in fparser.dependents.items()},
+            'includes':    fparser.includes,
+            'executables': fparser.executables(),
+            'fragments':   dict(fparser.fragments),
+            'unreachable': fparser.unreachable}
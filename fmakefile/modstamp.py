@@ -0,0 +1,141 @@
+import os
+import sys
+import gzip
+import shutil
+import hashlib
+import optparse
+import subprocess
+
+####################################################################################################
+
+STAMP_EXTENSION = '.stamp'
+BACKUP_EXTENSION = '.prev'
+
+####################################################################################################
+
+def fingerprint(path):
+    '''
+    Get fingerprint of the compiled module interface file (.mod, .smod). gfortran files are
+    compressed, so the payload is hashed (gzip header contains modification time).
+    '''
+    with open(path, 'rb') as stream:
+        data = stream.read()
+
+    if data[:2] == b'\x1f\x8b':
+        try:
+            data = gzip.decompress(data)
+        except (OSError, EOFError):
+            pass
+
+    return hashlib.sha1(data).hexdigest()
+
+####################################################################################################
+
+def read_stamp(path):
+    try:
+        with open(path + STAMP_EXTENSION, encoding='utf-8') as stream:
+            return stream.read().strip()
+    except OSError:
+        return None
+
+####################################################################################################
+
+def create_missing_stamps(modules):
+    '''
+    Create stamps of existing <modules> having none (e.g. built before stamps were enabled).
+    Stamp gets modification time of the module, so up-to-date users are not compiled again.
+
+    Returns:
+        number of created stamps
+    '''
+    created = 0
+    for module in modules:
+        if not os.path.isfile(module) or os.path.isfile(module + STAMP_EXTENSION):
+            continue
+
+        with open(module + STAMP_EXTENSION, 'w', encoding='utf-8') as stream:
+            stream.write(fingerprint(module) + '\n')
+
+        stat = os.stat(module)
+        os.utime(module + STAMP_EXTENSION, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        created += 1
+
+    return created
+
+####################################################################################################
+
+def compile_with_stamps(command, modules):
+    '''
+    Run compiler <command> keeping the <modules> (interface files it produces) untouched if
+    their fingerprints have not changed. Stamp file (module.stamp) keeps the fingerprint and
+    is rewritten only when the interface changes, so files using the module depend on the
+    stamp instead of the module itself.
+
+    Arguments:
+        command - compiler call
+        modules - .mod and .smod files produced by the compilation
+
+    Returns:
+        exit code of the compiler
+    '''
+    backups = {}
+    for module in modules:
+        if os.path.isfile(module) and read_stamp(module) is not None:
+            backups[module] = module + BACKUP_EXTENSION
+            shutil.copy2(module, backups[module])
+
+    try:
+        code = subprocess.call(command)
+        if code:
+            return code
+
+        for module in modules:
+            if not os.path.isfile(module):
+                continue
+
+            current = fingerprint(module)
+            if current == read_stamp(module):
+
+                # compare-and-restore: the previous file keeps its modification time
+                if module in backups:
+                    os.replace(backups.pop(module), module)
+                continue
+
+            with open(module + STAMP_EXTENSION, 'w', encoding='utf-8') as stream:
+                stream.write(current + '\n')
+
+        return 0
+
+    finally:
+        for backup in backups.values():
+            try:
+                os.remove(backup)
+            except FileNotFoundError:
+                pass
+
+####################################################################################################
+
+def main(argv=None):
+    '''
+    Compiler wrapper used in generated makefiles:
+        python -m fmakefile.modstamp --module MOD -- COMPILER ARGS...
+    '''
+    parser = optparse.OptionParser(usage='%prog [options] -- compiler arguments')
+
+    parser.add_option('--module',
+                      dest='modules',
+                      action='append',
+                      default=[],
+                      help='module interface file produced by the compilation (.mod, .smod)')
+
+    (options, command) = parser.parse_args(argv)
+
+    if not command:
+        parser.error('compiler call is not specified')
+
+    return compile_with_stamps(command, options.modules)
+
+####################################################################################################
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,88 @@
+import os
+import json
+import time
+import threading
+
+from .makefile import write_if_changed
+
+####################################################################################################
+
+class TraceRecorder:
+    '''
+    Profiling hook (see ProjectParser.add_hook) collecting spans of work into Chrome trace
+    event format, which can be opened with chrome://tracing or https://ui.perfetto.dev.
+    '''
+
+    def __init__(self):
+        self.origin = time.perf_counter()
+        self.pid, self.tid = os.getpid(), threading.get_ident()
+        self.spans = []
+
+    def __call__(self, name, category, start, duration, args):
+        self.spans.append((name, category, start, duration, args))
+
+    def events(self):
+        '''
+        Get list of trace events (complete events, timestamps in microseconds). Spans of the
+        parsing workers are shown as separate threads.
+        '''
+        events, workers = [], set()
+        for name, category, start, duration, args in self.spans:
+            args = dict(args)
+            tid = args.pop('worker', self.tid)
+            if tid != self.tid:
+                workers.add(tid)
+            events.append({'name': name,
+                           'cat':  category,
+                           'ph':   'X',
+                           'ts':   round((start-self.origin)*1e6, 3),
+                           'dur':  round(duration*1e6, 3),
+                           'pid':  self.pid,
+                           'tid':  tid,
+                           'args': args})
+
+        names = [(self.tid, 'main')] + [(tid, f'worker {tid}') for tid in sorted(workers)]
+        for tid, name in names:
+            events.append({'name': 'thread_name', 'ph': 'M', 'pid': self.pid, 'tid': tid,
+                           'args': {'name': name}})
+
+        return events
+
+    def save(self, path):
+        '''
+        Write trace to the json file at <path>.
+        '''
+        write_if_changed(path, json.dumps({'traceEvents': self.events(),
+                                           'displayTimeUnit': 'ms'}))
+
+    def slowest(self, category='scan', top=10):
+        '''
+        Get <top> longest spans of the <category> as list of (name, duration, args).
+        '''
+        spans = [(name, duration, args) for name, cat, _, duration, args in self.spans
+                 if cat == category]
+        return sorted(spans, key=lambda span: span[1], reverse=True)[:top]
+
+    def print_summary(self, top=10):
+        '''
+        Print durations of the phases and the slowest files.
+        '''
+        print('\nPhases:')
+        for name, category, _, duration, _ in sorted(self.spans, key=lambda span: span[2]):
+            if category == 'phase':
+                print('  %-16s %10.3f ms' % (name, duration*1e3))
+
+        reading = {}
+        for _, category, _, duration, args in self.spans:
+            if category == 'read':
+                reading[args['file']] = reading.get(args['file'], 0) + duration
+
+        for category, title in (('scan', 'source files'), ('include', 'included files')):
+            spans = self.slowest(category, top)
+            if not spans:
+                continue
+            print(f'\nSlowest {title} (total, reading and decoding):')
+            for k, (name, duration, _) in enumerate(spans):
+                print('  %2d) %10.3f ms %10.3f ms  %s' % (k+1, duration*1e3,
+                                                         reading.get(name, 0)*1e3, name))
+        print()
@@ -0,0 +1,264 @@
+import os
+import time
+import select
+import struct
+import ctypes
+import ctypes.util
+import logging
+from pathlib import Path
+
+from .makefile import FortranSyntaxError, collect_files, is_ignored, platform_
+
+####################################################################################################
+
+logger = logging.getLogger(__name__)
+
+####################################################################################################
+
+def walk_directories(root, directory, ignore_paths):
+    '''
+    Collect <root> and all its subdirectories except ignored ones.
+
+    Arguments:
+        root         - directory to proceed
+        directory    - project directory
+        ignore_paths - subdirectories to be excluded
+    '''
+    directories = []
+    for (dirpath, dirnames, _) in os.walk(root):
+        dirnames[:] = [name for name in dirnames
+                       if not is_ignored(str(Path(dirpath) / name), directory, ignore_paths)]
+        directories.append(os.path.normpath(dirpath))
+    return directories
+
+####################################################################################################
+
+class InotifyWatcher:
+    '''
+    Watch directories with Linux inotify API (called via ctypes).
+    '''
+    IN_MODIFY      = 0x00000002
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_FROM  = 0x00000040
+    IN_MOVED_TO    = 0x00000080
+    IN_CREATE      = 0x00000100
+    IN_DELETE      = 0x00000200
+    IN_Q_OVERFLOW  = 0x00004000
+    IN_IGNORED     = 0x00008000
+    IN_ISDIR       = 0x40000000
+
+    MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+    EVENT = struct.Struct('iIII')
+
+    def __init__(self, directory, ignore_paths, extra_directories=()):
+        '''
+        Arguments:
+            directory         - project directory (watched recursively)
+            ignore_paths      - subdirectories to be excluded
+            extra_directories - other directories to watch (e.g. ones with included files)
+        '''
+        self.directory, self.ignore_paths = directory, ignore_paths
+
+        self.libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self.fd = self.libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+
+        self.watches, self.overflow = {}, False
+        for path in walk_directories(directory, directory, ignore_paths) + list(extra_directories):
+            self.add(path)
+
+    def add(self, directory):
+        '''
+        Start watching <directory> (not recursively).
+        '''
+        if directory in self.watches.values():
+            return
+
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(directory), self.MASK)
+        if wd < 0:
+            logger.warning('Cannot watch %s: %s', directory, os.strerror(ctypes.get_errno()))
+            return
+
+        self.watches[wd] = directory
+
+    def follow(self, files):
+        '''
+        Watch directories of <files> as well (e.g. newly included files).
+        '''
+        for file in files:
+            self.add(os.path.normpath(os.path.dirname(file) or '.'))
+
+    def wait(self, timeout=None):
+        '''
+        Wait for changes at most <timeout> seconds (forever if None).
+
+        Returns:
+            set of changed files (overflow flag is raised if some events were lost)
+        '''
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return set()
+
+        try:
+            data = os.read(self.fd, 1 << 16)
+        except BlockingIOError:
+            return set()
+
+        changed, offset = set(), 0
+        while offset < len(data):
+            wd, mask, _, length = self.EVENT.unpack_from(data, offset)
+            offset += self.EVENT.size + length
+            name = os.fsdecode(data[offset-length:offset].rstrip(b'\0'))
+
+            if mask & self.IN_Q_OVERFLOW:
+                self.overflow = True
+                continue
+
+            if mask & self.IN_IGNORED:
+                self.watches.pop(wd, None)
+                continue
+
+            directory = self.watches.get(wd)
+            if directory is None:
+                continue
+
+            path = os.path.normpath(os.path.join(directory, name))
+
+            if mask & self.IN_ISDIR:
+
+                # new subtree appeared (e.g. created or moved in by git checkout)
+                if mask & (self.IN_CREATE | self.IN_MOVED_TO):
+                    if is_ignored(path, self.directory, self.ignore_paths):
+                        continue
+                    for subdirectory in walk_directories(path, self.directory, self.ignore_paths):
+                        self.add(subdirectory)
+                        changed.update(os.path.join(subdirectory, file)
+                                       for file in os.listdir(subdirectory))
+                continue
+
+            changed.add(path)
+
+        return changed
+
+    def close(self):
+        os.close(self.fd)
+
+####################################################################################################
+
+class PollingWatcher:
+    '''
+    Watch files by comparing their modification times and sizes periodically.
+    '''
+
+    def __init__(self, fparser, interval=1.0):
+        '''
+        Arguments:
+            fparser  - project parser (defines the project directory, extensions and includes)
+            interval - time between checks (seconds)
+        '''
+        self.fparser, self.interval, self.overflow = fparser, interval, False
+        self.snapshot = self.take_snapshot()
+
+    def take_snapshot(self):
+        fparser, snapshot = self.fparser, {}
+        files = collect_files(fparser.directory, fparser.ignore_paths, fparser.extensions,
+                              fparser.collector)
+        for file in files + fparser.includes:
+            try:
+                stat = os.stat(file)
+            except OSError:
+                continue
+            snapshot[os.path.normpath(file)] = (stat.st_mtime_ns, stat.st_size)
+        return snapshot
+
+    def wait(self, timeout=None):
+        '''
+        Wait for changes at most <timeout> seconds (forever if None).
+
+        Returns:
+            set of changed files
+        '''
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            delay = self.interval
+            if deadline is not None:
+                delay = min(delay, max(0, deadline-time.monotonic()))
+            time.sleep(delay)
+
+            snapshot = self.take_snapshot()
+            changed = set(file for file in set(snapshot) | set(self.snapshot)
+                          if snapshot.get(file) != self.snapshot.get(file))
+            self.snapshot = snapshot
+
+            if changed or (deadline is not None and time.monotonic() >= deadline):
+                return changed
+
+    def follow(self, files):
+        '''
+        Included files are taken from the parser on every check.
+        '''
+        pass
+
+    def close(self):
+        pass
+
+####################################################################################################
+
+def create_watcher(fparser, poll=False, interval=1.0):
+    '''
+    Get inotify based watcher if available, otherwise polling one.
+    '''
+    if not poll and platform_ == 'Linux':
+        extra = set(os.path.normpath(os.path.dirname(file) or '.') for file in fparser.includes)
+        try:
+            return InotifyWatcher(fparser.directory, fparser.ignore_paths, sorted(extra))
+        except (OSError, AttributeError) as error:
+            logger.warning('inotify is not available (%s), fall back to polling.', error)
+
+    return PollingWatcher(fparser, interval)
+
+####################################################################################################
+
+def watch_project(fparser, directory, delay=0.5, poll=False, interval=1.0):
+    '''
+    Generate makefile for project at <directory> path and keep it up to date.
+    Bursts of changes (e.g. git checkout) are collected into a single regeneration.
+
+    Arguments:
+        fparser   - project parser
+        directory - project directory
+        delay     - quiet period (seconds) which finishes the burst of changes
+        poll      - force polling instead of inotify
+        interval  - time between checks when polling (seconds)
+    '''
+    fparser.create_makefile(directory)
+
+    watcher = create_watcher(fparser, poll, interval)
+    print(f'Watching {directory} with {type(watcher).__name__} (press Ctrl+C to stop).')
+
+    try:
+        while True:
+            changed = watcher.wait()
+            while True:
+                more = watcher.wait(delay)
+                if not more:
+                    break
+                changed |= more
+
+            overflow, watcher.overflow = watcher.overflow, False
+            try:
+                updated = fparser.update_project(None if overflow else changed)
+                if updated:
+                    print(f'Updated: {" ".join(updated)}')
+                    watcher.follow(fparser.includes)
+                    fparser.write_makefile()
+            except (FortranSyntaxError, OSError, UnicodeError) as error:
+                print(f'Failed to update {fparser.makefile_name}: {error}')
+
+    except KeyboardInterrupt:
+        pass
+
+    finally:
+        watcher.close()
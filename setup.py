@@ -10,11 +10,11 @@ setuptools.setup(
     long_description='Fortran makefile generator',
     long_description_content_type="text/markdown",
     url='none',
-    packages=setuptools.find_packages(),
+    packages=setuptools.find_packages(exclude=('benchmarks', 'benchmarks.*')),
     classifiers=[
         'Programming Language :: Python :: 3',
         'License :: OSI Approved :: MIT License',
         'Operating System :: OS Independent',
     ],
-    python_requires='>=3.6',
+    python_requires='>=3.7',
 )
@@ -0,0 +1,74 @@
+import os
+import time
+import tempfile
+import unittest
+
+from fmakefile.makefile import ProjectParser, generate
+
+####################################################################################################
+
+class ParseCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.temporary = tempfile.TemporaryDirectory()
+        self.directory = self.temporary.name
+        self.write('main.f90', 'program main\ninclude "inc/outer.inc"\nend program\n')
+        self.write('inc/outer.inc', 'include "inner.inc"\n')
+        self.write('inc/inner.inc', 'use alpha\n')
+        self.write('alpha.f90', 'module alpha\nend module\n')
+
+    def tearDown(self):
+        self.temporary.cleanup()
+
+    def write(self, name, text):
+        path = os.path.join(self.directory, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as stream:
+            stream.write(text)
+
+        # modification time is to change even on file systems with coarse timestamps
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, time.time_ns() + 10**9))
+
+    def parse(self, **settings):
+        fparser = ProjectParser(verbose=False, drop_execute_flag=False,
+                                cache='.fmakefile.cache', **settings)
+        fparser.analize_project(self.directory)
+        return fparser
+
+    def main(self, fparser):
+        return fparser.structure[os.path.join(self.directory, 'main.f90')]
+
+    def test_hit(self):
+        first = self.parse()
+        self.assertEqual((first.parse_cache.hits, first.parse_cache.misses), (0, 2))
+
+        second = self.parse()
+        self.assertEqual((second.parse_cache.hits, second.parse_cache.misses), (2, 0))
+        self.assertEqual(second.structure, first.structure)
+
+    def test_nested_include_changed(self):
+        self.parse()
+        self.write('inc/inner.inc', 'use beta\n')
+
+        fparser = self.parse()
+        self.assertEqual((fparser.parse_cache.hits, fparser.parse_cache.misses), (1, 1))
+        self.assertEqual(self.main(fparser)['dependencies'], ['beta'])
+
+    def test_settings_changed(self):
+        self.parse(pcompiler_params='-O2')
+
+        for settings in ({'pcompiler_params': '-O2 -DMPI'},
+                         {'ignore_modules': ['alpha']},
+                         {'preprocess': False}):
+            fparser = self.parse(**settings)
+            self.assertEqual(fparser.parse_cache.hits, 0, settings)
+
+    def test_generate_has_no_cache(self):
+        generate(self.directory)
+        self.assertFalse(os.path.exists(os.path.join(self.directory, '.fmakefile.cache')))
+
+####################################################################################################
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+import os
+import sys
+import tempfile
+import unittest
+import concurrent.futures
+
+from fmakefile.ccache import CompilationCache
+
+####################################################################################################
+
+def compiler(output, text):
+    '''
+    Get command of the fake compiler writing <text> into the <output> file.
+    '''
+    return [sys.executable, '-c', f'open({output!r}, "w").write({text!r})']
+
+def store_task(directory, key, output):
+    '''
+    Store the <output> with the <key> and register a hit (runs in a worker process).
+    '''
+    cache = CompilationCache(directory, max_size='1G')
+    cache.store(key, [output])
+    cache.count('hits')
+
+####################################################################################################
+
+class CompilationCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.temporary = tempfile.TemporaryDirectory()
+        self.directory = os.path.join(self.temporary.name, 'cache')
+        self.source = os.path.join(self.temporary.name, 'source.f90')
+        self.output = os.path.join(self.temporary.name, 'source.o')
+        with open(self.source, 'w', encoding='utf-8') as stream:
+            stream.write('module m\nend module\n')
+
+    def tearDown(self):
+        self.temporary.cleanup()
+
+    def test_miss_and_hit(self):
+        cache = CompilationCache(self.directory)
+        command = compiler(self.output, 'object')
+
+        self.assertEqual(cache.compile(command, [self.source], [self.output]), (0, ''))
+        os.remove(self.output)
+        self.assertEqual(cache.compile(command, [self.source], [self.output]), (0, ''))
+        with open(self.output, encoding='utf-8') as stream:
+            self.assertEqual(stream.read(), 'object')
+
+        with open(self.source, 'a', encoding='utf-8') as stream:
+            stream.write('! changed\n')
+        cache.compile(command, [self.source], [self.output])
+
+        statistics = cache.statistics()
+        self.assertEqual((cache.hits, cache.misses), (1, 2))
+        self.assertEqual((statistics['hits'], statistics['misses'], statistics['entries']),
+                         (1, 2, 2))
+
+        cache.zero_statistics()
+        self.assertEqual((cache.statistics()['hits'], cache.statistics()['misses']), (0, 0))
+
+    def test_eviction(self):
+        cache = CompilationCache(self.directory, max_size=2000)
+        for key in ('aa1', 'bb2', 'cc3'):
+            with open(self.output, 'w', encoding='utf-8') as stream:
+                stream.write(key * 300)
+            cache.store(key, [self.output])
+            os.utime(os.path.join(cache.entry(key), 'manifest.json'))
+
+        self.assertFalse(os.path.isdir(cache.entry('aa1')))
+        self.assertTrue(os.path.isdir(cache.entry('cc3')))
+        self.assertFalse(cache.restore('aa1', [self.output]))
+
+        statistics = cache.statistics()
+        self.assertLessEqual(statistics['size'], 2000)
+        self.assertEqual(cache.read_counters()['size'], statistics['size'])
+
+    def test_concurrent_store(self):
+        CompilationCache(self.directory).evict()  # start tracking size
+
+        outputs = []
+        for k in range(16):
+            outputs.append(os.path.join(self.temporary.name, f'{k}.o'))
+            with open(outputs[-1], 'w', encoding='utf-8') as stream:
+                stream.write('x' * (k + 1) * 100)
+
+        with concurrent.futures.ProcessPoolExecutor(4) as executor:
+            tasks = [executor.submit(store_task, self.directory, f'{k:02d}key', output)
+                     for k, output in enumerate(outputs)]
+            for task in tasks:
+                task.result()
+
+        cache = CompilationCache(self.directory)
+        statistics = cache.statistics()
+        self.assertEqual((statistics['hits'], statistics['entries']), (16, 16))
+        self.assertEqual(cache.read_counters()['size'], statistics['size'])
+
+####################################################################################################
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+import os
+import tempfile
+import unittest
+
+from fmakefile.makefile import (FortranSyntaxError, ProjectParser, find_cycle, generate,
+                                strongly_connected_components, topological_sort)
+
+####################################################################################################
+
+def write_project(directory, sources):
+    '''
+    Create source files from dictionary name -> text in the <directory>.
+    '''
+    for name, text in sources.items():
+        with open(os.path.join(directory, name), 'w', encoding='utf-8') as stream:
+            stream.write(text)
+
+####################################################################################################
+
+class OrderTest(unittest.TestCase):
+
+    def test_topological_sort(self):
+        edges = {'a': ['c', 'd'], 'b': ['d'], 'c': ['e'], 'd': ['e']}
+        ordered, unresolved = topological_sort(['e', 'd', 'c', 'b', 'a'], edges)
+        self.assertEqual(ordered, ['b', 'a', 'c', 'd', 'e'])
+        self.assertEqual(unresolved, [])
+
+    def test_unresolved(self):
+        edges = {'a': ['b'], 'b': ['c'], 'c': ['b', 'd']}
+        ordered, unresolved = topological_sort(['a', 'b', 'c', 'd'], edges)
+        self.assertEqual(ordered, ['a'])
+        self.assertEqual(unresolved, ['b', 'c', 'd'])
+
+    def test_deterministic_build_order(self):
+        sources = {'main.f90':  'program main\nuse gamma\nuse alpha\nend program\n',
+                   'alpha.f90': 'module alpha\nend module\n',
+                   'beta.f90':  'module beta\nuse alpha\nend module\n',
+                   'gamma.f90': 'module gamma\nuse beta\nend module\n',
+                   'delta.f90': 'subroutine delta()\nend subroutine\n'}
+
+        orders = []
+        for names in (list(sources), list(reversed(sources))):
+            with tempfile.TemporaryDirectory() as directory:
+                write_project(directory, {name: sources[name] for name in names})
+                result = generate(directory)
+                orders.append([os.path.relpath(file, directory) for file in result['objects']])
+
+        self.assertEqual(orders[0], orders[1])
+        self.assertEqual(orders[0], ['alpha.f90', 'delta.f90', 'beta.f90', 'gamma.f90',
+                                     'main.f90'])
+
+    def test_resolution_keeps_parse_results(self):
+        sources = {'main.f90': 'program main\nuse alpha\nend program\n',
+                   'alpha.f90': 'module alpha\nend module\n'
+                                'submodule (alpha) impl\nuse alpha\nend submodule\n'}
+
+        with tempfile.TemporaryDirectory() as directory:
+            write_project(directory, sources)
+            fparser = ProjectParser(verbose=False, drop_execute_flag=False)
+            fparser.analize_project(directory)
+            alpha = os.path.join(directory, 'alpha.f90')
+
+            fparser.resolve_dependencies()
+            self.assertEqual(fparser.structure[alpha]['dependencies'], ['alpha', 'alpha@'])
+            self.assertEqual(fparser.used_modules(alpha), [])
+            self.assertEqual(fparser.update_project([alpha]), [])
+
+####################################################################################################
+
+class CycleTest(unittest.TestCase):
+
+    def test_components(self):
+        edges = {'a': ['b'], 'b': ['c'], 'c': ['a', 'd'], 'd': []}
+        components = strongly_connected_components(['a', 'b', 'c', 'd'], edges)
+        self.assertEqual(sorted(map(sorted, components)), [['a', 'b', 'c'], ['d']])
+
+        cycle = find_cycle(['a', 'b', 'c'], edges)
+        self.assertEqual(cycle, ['a', 'b', 'c', 'a'])
+
+    def test_report(self):
+        sources = {'main.f90':  'program main\nuse one\nend program\n',
+                   'one.f90':   'module one\nuse three\nend module\n',
+                   'two.f90':   'module two\nuse one\nend module\n',
+                   'three.f90': 'module three\nuse two\nend module\n'}
+
+        with tempfile.TemporaryDirectory() as directory:
+            write_project(directory, sources)
+            with self.assertRaises(FortranSyntaxError) as context:
+                generate(directory)
+
+        report = str(context.exception).replace(directory + os.sep, '')
+        self.assertIn('Found cyclic dependencies', report)
+        for line in ('one.f90 uses three from three.f90', 'three.f90 uses two from two.f90',
+                     'two.f90 uses one from one.f90'):
+            self.assertIn(line, report)
+        self.assertIn('Files depending on the cycles:\nName main.f90', report)
+
+####################################################################################################
+
+if __name__ == '__main__':
+    unittest.main()
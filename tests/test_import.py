@@ -0,0 +1,56 @@
+import os
+import sys
+import json
+import unittest
+import subprocess
+
+####################################################################################################
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# import takes about 50-70 ms without bytecode cache, the budget leaves room for slow machines
+IMPORT_BUDGET = 0.5
+
+PROBE = '''
+import sys, json, time, logging
+
+started = time.perf_counter()
+import fmakefile
+duration = time.perf_counter() - started
+
+print(json.dumps({'duration':      duration,
+                  'root_handlers': len(logging.getLogger().handlers),
+                  'root_level':    logging.getLogger().level,
+                  'modules':       sorted(sys.modules)}))
+'''
+
+####################################################################################################
+
+def import_package():
+    '''
+    Import fmakefile in a fresh interpreter and get what the import did.
+    '''
+    environment = dict(os.environ, PYTHONPATH=ROOT)
+    output = subprocess.check_output([sys.executable, '-c', PROBE], cwd=ROOT, env=environment,
+                                     universal_newlines=True)
+    return json.loads(output)
+
+####################################################################################################
+
+class ImportTest(unittest.TestCase):
+
+    def test_no_side_effects(self):
+        result = import_package()
+        self.assertEqual(result['root_handlers'], 0)
+        self.assertEqual(result['root_level'], 30)  # logging.WARNING, the default one
+        for module in ('treelib', 'subprocess'):
+            self.assertNotIn(module, result['modules'])
+
+    def test_import_time(self):
+        duration = min(import_package()['duration'] for _ in range(3))
+        self.assertLess(duration, IMPORT_BUDGET)
+
+####################################################################################################
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,139 @@
+import os
+import tempfile
+import unittest
+
+from fmakefile.makefile import (evaluate_condition, preprocess_lines, preprocessor_definitions,
+                                scan_source_file)
+
+####################################################################################################
+
+def active(text, defines=None, include=None):
+    '''
+    Get lines of the active branches of <text>.
+    '''
+    return list(preprocess_lines(text.splitlines(), dict(defines or {}), include=include))
+
+####################################################################################################
+
+class DefinitionsTest(unittest.TestCase):
+
+    def test_compiler_options(self):
+        defines = preprocessor_definitions('-O2 -DMPI -DNPROC=4 -D DEBUG=2 /DWIN -DGONE -UGONE')
+        self.assertEqual(defines, {'MPI': '1', 'NPROC': '4', 'DEBUG': '2', 'WIN': '1'})
+
+####################################################################################################
+
+class ConditionTest(unittest.TestCase):
+
+    def test_defined(self):
+        defines = {'A': '1'}
+        self.assertTrue(evaluate_condition('defined(A)', defines))
+        self.assertTrue(evaluate_condition('defined A', defines))
+        self.assertFalse(evaluate_condition('defined(B)', defines))
+        self.assertTrue(evaluate_condition('!defined B && defined(A)', defines))
+
+    def test_values(self):
+        defines = preprocessor_definitions('-DNPROC=4 -DLEVEL=NPROC -DHEX=0x10')
+        self.assertTrue(evaluate_condition('NPROC > 1', defines))
+        self.assertFalse(evaluate_condition('NPROC == 2 || UNDEFINED', defines))
+        self.assertTrue(evaluate_condition('LEVEL * 4 == HEX', defines))
+        self.assertTrue(evaluate_condition('(NPROC - 2) % 2 == 0 /* comment */', defines))
+
+    def test_unknown_macros(self):
+        self.assertIsNone(evaluate_condition('defined(_OPENMP)', {}))
+        self.assertIsNone(evaluate_condition('__GFORTRAN__ && 1', {}))
+        self.assertIsNone(evaluate_condition('defined(MPI)', {'MPI': None}))
+        self.assertTrue(evaluate_condition('defined(_OPENMP)', {'_OPENMP': '201511'}))
+
+    def test_function_like_macros(self):
+        self.assertIsNone(evaluate_condition('VERSION(1, 2) > 0', {}))
+
+####################################################################################################
+
+class PreprocessTest(unittest.TestCase):
+
+    def test_nesting(self):
+        text = ('#ifdef A\n'
+                'a\n'
+                '#  ifndef B\n'
+                'a_not_b\n'
+                '#  elif C > 1\n'
+                'a_c\n'
+                '#  else\n'
+                'a_else\n'
+                '#  endif\n'
+                '#else\n'
+                'not_a\n'
+                '#endif\n'
+                'always\n')
+        self.assertEqual(active(text, {'A': '1'}), ['a', 'a_not_b', 'always'])
+        self.assertEqual(active(text, {'A': '1', 'B': '1', 'C': '2'}), ['a', 'a_c', 'always'])
+        self.assertEqual(active(text, {'A': '1', 'B': '1'}), ['a', 'a_else', 'always'])
+        self.assertEqual(active(text, {'C': '2'}), ['not_a', 'always'])
+
+    def test_define_undef(self):
+        text = ('#define X 3\n'
+                '#if X == 3\n'
+                'three\n'
+                '#endif\n'
+                '#undef X\n'
+                '#ifdef X\n'
+                'defined\n'
+                '#endif\n')
+        self.assertEqual(active(text), ['three'])
+
+    def test_unknown_branches(self):
+        text = ('#ifdef _OPENMP\n'
+                'use omp_x\n'
+                '#else\n'
+                'use serial_x\n'
+                '#endif\n'
+                '#if FEATURE(2)\n'
+                'use feature_x\n'
+                '#elif defined(NOPE)\n'
+                'use nope_x\n'
+                '#endif\n')
+        self.assertEqual(active(text), ['use omp_x', 'use serial_x', 'use feature_x',
+                                        'use nope_x'])
+
+    def test_include_in_disabled_branch(self):
+        included = []
+        text = ('#ifdef A\n'
+                '#include "a.h"\n'
+                '#else\n'
+                '#include <b.h>\n'
+                '#endif\n')
+        active(text, include=included.append)
+        self.assertEqual(included, ['b.h'])
+
+    def test_scan(self):
+        with tempfile.TemporaryDirectory() as directory:
+            with open(os.path.join(directory, 'config.h'), 'w') as stream:
+                stream.write('#define NPROC 4\n')
+            path = os.path.join(directory, 'main.F90')
+            with open(path, 'w') as stream:
+                stream.write('#include "config.h"\n'
+                             'program main\n'
+                             '#if defined(MPI) && NPROC > 1\n'
+                             'use m_mpi\n'
+                             '#else\n'
+                             'use m_serial\n'
+                             '#endif\n'
+                             '#ifdef DISABLED\n'
+                             '#include "missing.h"\n'
+                             '#endif\n'
+                             'end program\n')
+
+            serial = scan_source_file(path, defines={})
+            parallel = scan_source_file(path, defines={'MPI': '1'})
+            unknown = scan_source_file(path, defines={'MPI': None})
+
+        self.assertEqual(serial['dependencies'], ['m_serial'])
+        self.assertEqual(parallel['dependencies'], ['m_mpi'])
+        self.assertEqual(unknown['dependencies'], ['m_mpi', 'm_serial'])
+        self.assertEqual(serial['includes'], [os.path.join(directory, 'config.h')])
+
+####################################################################################################
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,124 @@
+import os
+import tempfile
+import unittest
+
+from fmakefile.makefile import ProjectParser, iter_statements, scan_source_file
+
+####################################################################################################
+
+def scan(text, name='source.f90', **settings):
+    '''
+    Write <text> into the file <name> of a temporary directory and scan it.
+    '''
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, name)
+        with open(path, 'w', encoding='utf-8') as stream:
+            stream.write(text)
+        return scan_source_file(path, **settings)
+
+####################################################################################################
+
+class FreeFormTest(unittest.TestCase):
+
+    def test_separated_statements(self):
+        lines = ['use a; use b ;call c()']
+        self.assertEqual(list(iter_statements(lines)), ['use a', 'use b', 'call c()'])
+
+    def test_continuation(self):
+        lines = ['use &', '   ! comment between', '  & long_module_name, only: x']
+        self.assertEqual(list(iter_statements(lines)), ['use  long_module_name, only: x'])
+
+    def test_quotes(self):
+        lines = ["print *, 'not a comment ! ; use fake'  ! comment; use fake2",
+                 'print *, "it\'s" ; use real']
+        self.assertEqual(list(iter_statements(lines)),
+                         ["print *, 'not a comment ! ; use fake'",
+                          'print *, "it\'s"', 'use real'])
+
+    def test_use_statements(self):
+        contains = scan('module m\n'
+                        'use, intrinsic :: iso_fortran_env\n'
+                        'use, non_intrinsic :: own_env\n'
+                        'use :: first\n'
+                        'USE Second, only: x => y\n'
+                        'end module\n')
+        self.assertEqual(contains['modules'], ['m'])
+        self.assertEqual(contains['dependencies'], ['own_env', 'first', 'second'])
+
+    def test_interface_blocks(self):
+        contains = scan('subroutine outer(f)\n'
+                        'interface\n'
+                        '  real function f(x)\n'
+                        '  end function\n'
+                        '  subroutine g()\n'
+                        '  end subroutine\n'
+                        'end interface\n'
+                        'end subroutine\n')
+        self.assertEqual(contains['subroutines'], ['outer'])
+        self.assertEqual(contains['functions'], [])
+
+    def test_function_prefixes(self):
+        contains = scan('pure elemental integer(kind=8) function a(x)\n'
+                        'end function\n'
+                        'recursive function b(n) result(r)\n'
+                        'end function\n'
+                        'character(len=*) function c()\n'
+                        'end function\n'
+                        'module procedure d\n'
+                        'end procedure\n'
+                        'impure elemental subroutine e()\n'
+                        'end subroutine\n')
+        self.assertEqual(contains['functions'], ['a', 'b', 'c'])
+        self.assertEqual(contains['subroutines'], ['e'])
+        self.assertEqual(contains['modules'], [])
+
+    def test_parse_source_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'source.f90')
+            with open(path, 'w', encoding='utf-8') as stream:
+                stream.write('module m\nuse skipped\nuse kept\nend module\n')
+
+            fparser = ProjectParser(verbose=False, ignore_modules=['skipped'])
+            contains = fparser.parse_source_file(path)
+
+        self.assertEqual(contains['dependencies'], ['kept'])
+        self.assertEqual(fparser.modules, {'m': path})
+
+####################################################################################################
+
+class FixedFormTest(unittest.TestCase):
+
+    def test_comments(self):
+        lines = ['C     USE FAKE1', 'c     USE FAKE2', '*     USE FAKE3', '      ! USE FAKE4',
+                 '      USE REAL']
+        self.assertEqual(list(iter_statements(lines, fixed_form=True)), ['USE REAL'])
+
+    def test_column_6_continuation(self):
+        lines = ['      USE', '     &MOD2', '      CALL A(1,', '     12)']
+        self.assertEqual(list(iter_statements(lines, fixed_form=True)),
+                         ['USE MOD2', 'CALL A(1, 2)'])
+
+    def test_tab_continuation(self):
+        lines = ['\tUSE', '\t1MOD3', '\tCALL B']
+        self.assertEqual(list(iter_statements(lines, fixed_form=True)), ['USE MOD3', 'CALL B'])
+
+    def test_line_length(self):
+        lines = ['      X = 1' + ' '*61 + 'SEQUENCE NUMBER']
+        self.assertEqual(list(iter_statements(lines, fixed_form=True)), ['X = 1'])
+        self.assertEqual(list(iter_statements(lines, fixed_form=True, line_length=132)),
+                         ['X = 1' + ' '*61 + 'SEQUENCE NUMBER'])
+
+    def test_dependencies(self):
+        contains = scan('C     comment\n'
+                        '      PROGRAM P\n'
+                        '      USE\n'
+                        '     &ALPHA\n'
+                        '      USE BETA\n'
+                        '      END\n', name='source.f')
+        self.assertEqual(contains['entry_point'], 'p')
+        self.assertEqual(contains['dependencies'], ['alpha', 'beta'])
+
+####################################################################################################
+
+if __name__ == '__main__':
+    unittest.main()